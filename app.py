@@ -1,21 +1,39 @@
+import io
 import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime
 
-from flask import Flask, request
+from flask import Blueprint, Flask, Response, current_app, g, request, stream_with_context
 
 import dbmanager
+import dbwriter
+import partitions
 import utils
-from data import CampusAccount, RolesManager, EventsManager, Event, IndicatorsManager, Indicator, UniversityManager
+from compression import ResponseCompressor
+from data import CampusAccount, RolesManager, EventsManager, Event, IndicatorsManager, Indicator, UniversityManager, \
+    CompetenceSettlement, TestResultsManager, EventReviewsManager, EventRequestsManager, \
+    ChatsManager, CompetenciesManager, CompetenceLevelResolver, LeaderboardsManager
+from maintenance import MaintenanceScheduler
+from reports import ReportsManager
 
-app = Flask(__name__)
+api = Blueprint('api', __name__)
 
+# Components of create_app(), each can be switched off in the config passed to it.
+default_config = {
+    "INIT_DB": True,
+    "COMPRESSION": True,
+    "WARM_UP": True,
+    "MAINTENANCE": True,
+}
 
-@app.route('/campus/api/v1/health', methods=["GET"])
+
+@api.route('/campus/api/v1/health', methods=["GET"])
 def health():
     return json.dumps({"status": "OK"})
 
 
-@app.route('/campus/api/v1/login', methods=["POST"])
+@api.route('/campus/api/v1/login', methods=["POST"])
 def login():
     data = request.json
     email = data.get('email')
@@ -37,7 +55,7 @@ def login():
             {'message': 'OK'})
 
 
-@app.route('/campus/api/v1/register', methods=["POST"])
+@api.route('/campus/api/v1/register', methods=["POST"])
 def register():
     data = request.json
     email = data.get('email')
@@ -65,10 +83,10 @@ def register():
         })
 
 
-# @app.route('/campus/api/v1/my_sessions', methods=["POST"])
+# @api.route('/campus/api/v1/my_sessions', methods=["POST"])
 # def get_sessions():
 #     pass
-@app.route('/campus/api/v1/edit_event', methods=["POST"])
+@api.route('/campus/api/v1/edit_event', methods=["POST"])
 def edit_event():
     data = request.json
     image = request.files['image']
@@ -79,6 +97,7 @@ def edit_event():
     title = data.get('title')
     description = data.get('description')
     start_date = data.get('start_date')
+    capacity = data.get('capacity')
 
     indicators_list: list = None
 
@@ -110,7 +129,8 @@ def edit_event():
             if image is not None:
                 image_path = f'./images/events_photos/{title}'
                 image.save(image_path)
-            EventsManager.edit_event(event_id, title, description, start_date, address, image_path, indicators_list)
+            EventsManager.edit_event(event_id, title, description, start_date, address, image_path, indicators_list,
+                                     capacity)
             return (json.dumps({'message': "OK"}), 200, {
                 'message': "OK"
             })
@@ -120,7 +140,7 @@ def edit_event():
             })
 
 
-@app.route('/campus/api/v1/get_event_list', methods=["POST"])
+@api.route('/campus/api/v1/get_event_list', methods=["POST"])
 def get_event_list():
     data = request.json
     api_key = data.get('api_key')
@@ -137,7 +157,202 @@ def get_event_list():
         })
 
 
-@app.route('/campus/api/v1/get_all_indicators', methods=["POST"])
+@api.route('/campus/api/v1/search_events', methods=["POST"])
+def search_events():
+    data = request.json
+    api_key = data.get('api_key')
+    query = data.get('query')
+    indicator_id = data.get('indicator_id')
+    verified = data.get('verified')
+    limit = int(data.get('limit', 20))
+    offset = int(data.get('offset', 0))
+
+    if not isinstance(query, str):
+        return (json.dumps({'message': "query must be a string"}), 400, {
+            'message': "query must be a string"
+        })
+    if limit < 1 or limit > 100 or offset < 0:
+        return (json.dumps({'message': "invalid pagination"}), 400, {
+            'message': "invalid pagination"
+        })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    else:
+        result = EventsManager.search_events_as_json(query, indicator_id, verified, limit, offset)
+        return (result, 200, {
+            'message': "OK"
+        })
+
+
+@api.route('/campus/api/v1/add_event_review', methods=["POST"])
+def add_event_review():
+    data = request.json
+    api_key = data.get('api_key')
+    event_id = data.get('event_id')
+    stars = data.get('stars')
+    text = data.get('text')
+
+    if not isinstance(stars, int) or isinstance(stars, bool) or not 1 <= stars <= 5:
+        return (json.dumps({'message': "stars must be an integer from 1 to 5"}), 400, {
+            'message': "stars must be an integer from 1 to 5"
+        })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    if not dbmanager.event_exists(event_id):
+        return (json.dumps({'message': "event not found"}), 400, {
+            'message': "event not found"
+        })
+    review_id = EventReviewsManager.add_review(event_id, account.user_id, stars, text)
+    return (json.dumps({'message': "OK", 'review_id': review_id}), 200, {
+        'message': "OK"
+    })
+
+
+@api.route('/campus/api/v1/get_event_reviews', methods=["POST"])
+def get_event_reviews():
+    data = request.json
+    api_key = data.get('api_key')
+    event_id = data.get('event_id')
+    before_id = data.get('before_id')
+    limit = int(data.get('limit', 20))
+
+    if limit < 1 or limit > 100:
+        return (json.dumps({'message': "invalid pagination"}), 400, {
+            'message': "invalid pagination"
+        })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    else:
+        result = EventReviewsManager.get_reviews_as_json(event_id, before_id, limit)
+        return (result, 200, {
+            'message': "OK"
+        })
+
+
+@api.route('/campus/api/v1/events/join', methods=["POST"])
+def join_event():
+    data = request.json
+    api_key = data.get('api_key')
+    event_id = data.get('event_id')
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    if not dbmanager.event_exists(event_id):
+        return (json.dumps({'message': "event not found"}), 400, {
+            'message': "event not found"
+        })
+    status = EventRequestsManager.join(event_id, account.user_id)
+    return (json.dumps({'message': "OK", 'status': status}), 200, {
+        'message': "OK"
+    })
+
+
+@api.route('/campus/api/v1/events/cancel', methods=["POST"])
+def cancel_event_request():
+    data = request.json
+    api_key = data.get('api_key')
+    event_id = data.get('event_id')
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    if not EventRequestsManager.cancel(event_id, account.user_id):
+        return (json.dumps({'message': "request not found"}), 400, {
+            'message': "request not found"
+        })
+    return (json.dumps({'message': "OK"}), 200, {
+        'message': "OK"
+    })
+
+
+@api.route('/campus/api/v1/events/get_requests', methods=["POST"])
+def get_event_requests():
+    data = request.json
+    api_key = data.get('api_key')
+    event_id = data.get('event_id')
+    status = data.get('status', "pending")
+    after_id = int(data.get('after_id', 0))
+    limit = int(data.get('limit', 100))
+
+    if limit < 1 or limit > 1000:
+        return (json.dumps({'message': "invalid pagination"}), 400, {
+            'message': "invalid pagination"
+        })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    event = Event.get_by_id(event_id)
+    if event is None:
+        return (json.dumps({'message': "event not found"}), 400, {
+            'message': "event not found"
+        })
+    if account.role_id == 3 or event.organizer_id == account.user_id:
+        result = EventRequestsManager.get_requests_as_json(event_id, status, after_id, limit)
+        return (result, 200, {
+            'message': "OK"
+        })
+    else:
+        return (json.dumps({'message': "you don't have permission"}), 400, {
+            'message': "you don't have permission"
+        })
+
+
+@api.route('/campus/api/v1/events/review_requests', methods=["POST"])
+def review_event_requests():
+    data = request.json
+    api_key = data.get('api_key')
+    event_id = data.get('event_id')
+    approve = data.get('approve', [])
+    reject = data.get('reject', [])
+
+    for user_ids in (approve, reject):
+        if not isinstance(user_ids, list) or not all(isinstance(user_id, int) for user_id in user_ids):
+            return (json.dumps({'message': "approve and reject must be lists of user ids"}), 400, {
+                'message': "approve and reject must be lists of user ids"
+            })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    event = Event.get_by_id(event_id)
+    if event is None:
+        return (json.dumps({'message': "event not found"}), 400, {
+            'message': "event not found"
+        })
+    if account.role_id == 3 or event.organizer_id == account.user_id:
+        result = EventRequestsManager.review(event_id, approve, reject)
+        return (json.dumps(dict(result, message="OK")), 200, {
+            'message': "OK"
+        })
+    else:
+        return (json.dumps({'message': "you don't have permission"}), 400, {
+            'message': "you don't have permission"
+        })
+
+
+@api.route('/campus/api/v1/get_all_indicators', methods=["POST"])
 def get_all_indicators():
     data = request.json
     api_key = data.get('api_key')
@@ -154,22 +369,32 @@ def get_all_indicators():
         })
 
 
-@app.route('/campus/api/v1/get_event', methods=["POST"])
+@api.route('/campus/api/v1/get_event', methods=["POST"])
 def get_event():
     data = request.json
     api_key = data.get('api_key')
     event_id = data.get('event_id')
 
-    account = CampusAccount.get_from_api_key(api_key)
-    if account is None:
+    auth = dbmanager.get_account_auth(api_key)
+    if auth is None:
         return (json.dumps({'message': "account not found"}), 400, {
             'message': "account not found"
         })
     else:
-        if account.role_id == 3 or account.role_id == 2:
+        if auth[1] == 3 or auth[1] == 2:
+            version = dbmanager.get_event_version(event_id)
+            if version is None:
+                return (json.dumps({'message': "event not found"}), 400, {
+                    'message': "event not found"
+                })
+            # Weak ETags: the same version is sent gzip-compressed or not, which strong validators must tell apart.
+            etag = f"event-{event_id}-{version}"
+            if request.if_none_match.contains_weak(etag):
+                return ('', 304, {'ETag': f'W/"{etag}"'})
             result = Event.get_by_id(event_id)
             return (result.get_json_info(), 200, {
-                'message': "OK"
+                'message': "OK",
+                'ETag': f'W/"{etag}"'
             })
         else:
             return (json.dumps({'message': "you don't have permission"}), 400, {
@@ -177,7 +402,7 @@ def get_event():
             })
 
 
-@app.route('/campus/api/v1/get_suggested_events', methods=["POST"])
+@api.route('/campus/api/v1/get_suggested_events', methods=["POST"])
 def get_suggested_events():
     data = request.json
     api_key = data.get('api_key')
@@ -188,39 +413,48 @@ def get_suggested_events():
             'message': "account not found"
         })
     else:
-        event_list = account.get_suggested_events()
-        return (json.dumps({"events": [{"event.id": event.event_id} for event in event_list]}), 200, {
+        event_ids = account.get_suggested_event_ids()
+        return (json.dumps({"events": [{"event.id": event_id} for event_id in event_ids]}), 200, {
             'message': "OK"
         })
 
 
-# @app.route('/campus/api/v1/load_test_results', methods=["POST"])
-# def load_test_results():
-#     data = request.json
-#     api_key = data.get('api_key')
-#     test_results = data.get('test_results')
-#     if test_results is not dict:
-#         return (json.dumps({'message': "test_results must be a json object"}), 400, {
-#             'message': "test_results must be a json object"
-#         })
-#
-#     test_type_id = int(test_results["test_type_id"])
-#
-#
-#
-#     account = CampusAccount.get_from_api_key(api_key)
-#     if account is None:
-#         return (json.dumps({'message': "account not found"}), 400, {
-#             'message': "account not found"
-#         })
-#     else:
-#         result = EventsManager.load_test_results()
-#         return (result, 200, {
-#             'message': "OK"
-#         })
-
-
-@app.route('/campus/api/v1/add_event', methods=["POST"])
+@api.route('/campus/api/v1/load_test_results', methods=["POST"])
+def load_test_results():
+    api_key = request.form.get('api_key')
+    test_results = request.files.get('test_results')
+    fmt = request.form.get('format')
+
+    if test_results is None:
+        return (json.dumps({'message': "test_results file is required"}), 400, {
+            'message': "test_results file is required"
+        })
+    if fmt is None:
+        fmt = "csv" if (test_results.filename or "").lower().endswith(".csv") else "ndjson"
+    if fmt not in ("ndjson", "csv"):
+        return (json.dumps({'message': "format must be ndjson or csv"}), 400, {
+            'message': "format must be ndjson or csv"
+        })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    else:
+        if account.role_id == 3 or account.role_id == 2:
+            stream = io.TextIOWrapper(test_results.stream, encoding="utf-8-sig", newline="")
+            result = TestResultsManager.load_stream(stream, fmt)
+            return (json.dumps(result), 200, {
+                'message': "OK"
+            })
+        else:
+            return (json.dumps({'message': "you don't have permission"}), 400, {
+                'message': "you don't have permission"
+            })
+
+
+@api.route('/campus/api/v1/add_event', methods=["POST"])
 def add_event():
     data = request.json
     image = request.files['image']
@@ -228,7 +462,7 @@ def add_event():
     address = data.get('address')
     title = data.get('title')
     description = data.get('description')
-    start_date = data.get('start_date')
+    start_date = datetime.strptime(data.get('start_date'), "%Y-%m-%d %H:%M:%S")
 
     account = CampusAccount.get_from_api_key(api_key)
     if account is None:
@@ -249,7 +483,134 @@ def add_event():
             })
 
 
-@app.route('/campus/api/v1/set_my_profile_info', methods=["POST"])
+@api.route('/campus/api/v1/settle_event', methods=["POST"])
+def settle_event():
+    data = request.json
+    api_key = data.get('api_key')
+    event_id = data.get('event_id')
+    attendees = data.get('attendees')
+
+    if not isinstance(attendees, list) or not all(isinstance(user_id, int) for user_id in attendees):
+        return (json.dumps({'message': "attendees must be a list of user ids"}), 400, {
+            'message': "attendees must be a list of user ids"
+        })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    else:
+        if account.role_id == 3:
+            try:
+                credited = CompetenceSettlement.settle_event(event_id, attendees)
+            except ValueError as e:
+                return (json.dumps({'message': str(e)}), 400, {
+                    'message': str(e)
+                })
+            return (json.dumps({'message': "OK", 'credited': credited}), 200, {
+                'message': "OK"
+            })
+        else:
+            return (json.dumps({'message': "you don't have permission"}), 400, {
+                'message': "you don't have permission"
+            })
+
+
+@api.route('/campus/api/v1/moderation/queue', methods=["POST"])
+def get_moderation_queue():
+    data = request.json
+    api_key = data.get('api_key')
+    after_date = data.get('after_date')
+    after_id = data.get('after_id')
+    limit = int(data.get('limit', 50))
+
+    if limit < 1 or limit > 500:
+        return (json.dumps({'message': "invalid pagination"}), 400, {
+            'message': "invalid pagination"
+        })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    else:
+        # Events are moderated by assessors.
+        if account.role_id == 2:
+            result = EventsManager.get_moderation_queue_as_json(after_date, after_id, limit)
+            return (result, 200, {
+                'message': "OK"
+            })
+        else:
+            return (json.dumps({'message': "you don't have permission"}), 400, {
+                'message': "you don't have permission"
+            })
+
+
+@api.route('/campus/api/v1/moderation/decide', methods=["POST"])
+def decide_events():
+    data = request.json
+    api_key = data.get('api_key')
+    verify_ids = data.get('verify', [])
+    reject_ids = data.get('reject', [])
+
+    if not all(isinstance(ids, list) and all(isinstance(event_id, int) for event_id in ids)
+               for ids in (verify_ids, reject_ids)):
+        return (json.dumps({'message': "verify and reject must be lists of event ids"}), 400, {
+            'message': "verify and reject must be lists of event ids"
+        })
+    if len(verify_ids) + len(reject_ids) > 5000:
+        return (json.dumps({'message': "too many events"}), 400, {
+            'message': "too many events"
+        })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    else:
+        if account.role_id == 2:
+            decided = EventsManager.decide_events(verify_ids, reject_ids)
+            return (json.dumps({'message': "OK", **decided}), 200, {
+                'message': "OK"
+            })
+        else:
+            return (json.dumps({'message': "you don't have permission"}), 400, {
+                'message': "you don't have permission"
+            })
+
+
+@api.route('/campus/api/v1/reports/<name>', methods=["POST"])
+def get_report(name: str):
+    data = request.json
+    api_key = data.get('api_key')
+    university_id = data.get('university_id')
+
+    if name not in ReportsManager.reports:
+        return (json.dumps({'message': "report not found"}), 404, {
+            'message': "report not found"
+        })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    else:
+        if account.role_id == 3:
+            # The request context, and with it the partition of the request, is kept until the report is sent.
+            return Response(stream_with_context(ReportsManager.stream_report(name, university_id)),
+                            mimetype=ReportsManager.mimetype,
+                            headers={'Content-Disposition': f'attachment; filename="{name}.xlsx"'})
+        else:
+            return (json.dumps({'message': "you don't have permission"}), 400, {
+                'message': "you don't have permission"
+            })
+
+
+@api.route('/campus/api/v1/set_my_profile_info', methods=["POST"])
 def set_user_profile():
     data = request.json
     api_key = data.get('api_key')
@@ -269,6 +630,14 @@ def set_user_profile():
         return (json.dumps({'message': "account not found"}), 400, {
             'message': "account not found"
         })
+    elif partitions.enabled() and university != account.university_id:
+        return (json.dumps({'message': "university cannot be changed while partitioning is enabled"}), 400, {
+            'message': "university cannot be changed while partitioning is enabled"
+        })
+    elif email is not None and email != account.email and dbmanager.account_exists(email):
+        return (json.dumps({'message': 'account already exists'}), 409, {
+            'message': 'account already exists'
+        })
     else:
         account.edit(first_name, second_name, third_name, email, university)
         return (json.dumps({'message': "OK"}), 200, {
@@ -276,7 +645,7 @@ def set_user_profile():
         })
 
 
-@app.route('/campus/api/v1/users/set_indicators', methods=["POST"])
+@api.route('/campus/api/v1/users/set_indicators', methods=["POST"])
 def set_indicators():
     data = request.json
     user_id = data.get('user_id')
@@ -313,23 +682,64 @@ def set_indicators():
             })
 
 
-@app.route('/campus/api/v1/users/get_profile', methods=["POST"])
+@api.route('/campus/api/v1/users/get_profile', methods=["POST"])
 def get_user_profile():
     data = request.json
     user_id = data.get('user_id')
     api_key = data.get('api_key')
     as_role = data.get('as_role')
 
+    auth = dbmanager.get_account_auth(api_key)
+    if auth is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    roles = RolesManager()
+    if not roles.validate_role(as_role) or roles.get_role_by_id(auth[1]) != as_role:
+        return (json.dumps({'message': "invalid role"}), 400, {
+            'message': "invalid role"
+        })
+
+    if request.if_none_match:
+        version = dbmanager.get_user_version(user_id)
+        etag = f"user-{user_id}-{version}-{auth[1]}"
+        if version is not None and request.if_none_match.contains_weak(etag):
+            return ('', 304, {'ETag': f'W/"{etag}"'})
+
+    target_account = CampusAccount.get_by_id(user_id)
+    if target_account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    return (target_account.get_info_json_as(as_role), 200, {
+        'message': "OK",
+        'ETag': f'W/"user-{user_id}-{target_account.version}-{auth[1]}"'
+    })
+
+
+@api.route('/campus/api/v1/users/get_profiles', methods=["POST"])
+def get_user_profiles():
+    data = request.json
+    user_ids = data.get('user_ids')
+    api_key = data.get('api_key')
+    as_role = data.get('as_role')
+
+    if not isinstance(user_ids, list) or not all(isinstance(user_id, int) for user_id in user_ids):
+        return (json.dumps({'message': "user_ids must be a list of user ids"}), 400, {
+            'message': "user_ids must be a list of user ids"
+        })
+    if len(user_ids) > 500:
+        return (json.dumps({'message': "too many user ids"}), 400, {
+            'message': "too many user ids"
+        })
+
     by_account = CampusAccount.get_from_api_key(api_key)
     if by_account is not None:
-        if RolesManager.validate_role(as_role) and by_account.get_role_name() == as_role:
-            target_account = CampusAccount.get_by_id(user_id)
-            if target_account is None:
-                return (json.dumps({'message': "account not found"}), 400, {
-                    'message': "account not found"
-                })
-            else:
-                return target_account.get_info_json_as(as_role)
+        if RolesManager().validate_role(as_role) and by_account.get_role_name() == as_role:
+            accounts = CampusAccount.get_many_by_ids(user_ids)
+            return (json.dumps([account.get_info_as(as_role) for account in accounts]), 200, {
+                'message': "OK"
+            })
         else:
             return (json.dumps({'message': "invalid role"}), 400, {
                 'message': "invalid role"
@@ -340,21 +750,145 @@ def get_user_profile():
         })
 
 
-@app.route('/campus/api/v1/get_my_profile', methods=["POST"])
+@api.route('/campus/api/v1/get_my_profile', methods=["POST"])
 def get_my_profile():
     data = request.json
     api_key = data.get('api_key')
-    account = CampusAccount.get_from_api_key(api_key)
+
+    auth = dbmanager.get_account_auth(api_key)
+    if auth is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    user_id, _, version = auth
+    etag = f"me-{user_id}-{version}"
+    if request.if_none_match.contains_weak(etag):
+        return ('', 304, {'ETag': f'W/"{etag}"'})
+
+    account = CampusAccount.get_by_id(user_id)
     if account is None:
         return (json.dumps({'message': "account not found"}), 400, {
             'message': "account not found"
         })
     return (account.account_info_json_self(), 200, {
+        'message': "OK",
+        'ETag': f'W/"{etag}"'
+    })
+
+
+@api.route('/campus/api/v1/chats/open', methods=["POST"])
+def open_chat():
+    data = request.json
+    api_key = data.get('api_key')
+    user_id = data.get('user_id')
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    if user_id == account.user_id or not dbmanager.user_exists(user_id):
+        return (json.dumps({'message': "user not found"}), 400, {
+            'message': "user not found"
+        })
+    chat_id = ChatsManager.open_chat(account.user_id, user_id)
+    return (json.dumps({'message': "OK", 'chat_id': chat_id}), 200, {
         'message': "OK"
     })
 
 
-@app.route('/campus/api/v1/get_all_universities', methods=["POST"])
+@api.route('/campus/api/v1/chats/list', methods=["POST"])
+def get_chats():
+    data = request.json
+    api_key = data.get('api_key')
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    return (ChatsManager.get_chats_as_json(account.user_id), 200, {
+        'message': "OK"
+    })
+
+
+@api.route('/campus/api/v1/chats/send', methods=["POST"])
+def send_message():
+    data = request.json
+    api_key = data.get('api_key')
+    chat_id = data.get('chat_id')
+    text = data.get('text')
+
+    if not isinstance(text, str) or not text.strip():
+        return (json.dumps({'message': "text must be a non-empty string"}), 400, {
+            'message': "text must be a non-empty string"
+        })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    if not ChatsManager.is_member(chat_id, account.user_id):
+        return (json.dumps({'message': "chat not found"}), 400, {
+            'message': "chat not found"
+        })
+    message_id = ChatsManager.send_message(chat_id, account.user_id, text)
+    return (json.dumps({'message': "OK", 'message_id': message_id}), 200, {
+        'message': "OK"
+    })
+
+
+@api.route('/campus/api/v1/chats/history', methods=["POST"])
+def get_chat_history():
+    data = request.json
+    api_key = data.get('api_key')
+    chat_id = data.get('chat_id')
+    before_id = data.get('before_id')
+    limit = int(data.get('limit', 50))
+
+    if limit < 1 or limit > 200:
+        return (json.dumps({'message': "invalid pagination"}), 400, {
+            'message': "invalid pagination"
+        })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    if not ChatsManager.is_member(chat_id, account.user_id):
+        return (json.dumps({'message': "chat not found"}), 400, {
+            'message': "chat not found"
+        })
+    return (ChatsManager.get_history_as_json(chat_id, before_id, limit), 200, {
+        'message': "OK"
+    })
+
+
+@api.route('/campus/api/v1/chats/updates', methods=["POST"])
+def get_chat_updates():
+    data = request.json
+    api_key = data.get('api_key')
+    chat_id = data.get('chat_id')
+    after_id = int(data.get('after_id', 0))
+    timeout = min(float(data.get('timeout', 25)), 60)
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    if not ChatsManager.is_member(chat_id, account.user_id):
+        return (json.dumps({'message': "chat not found"}), 400, {
+            'message': "chat not found"
+        })
+    return (ChatsManager.wait_for_messages_as_json(chat_id, after_id, timeout), 200, {
+        'message': "OK"
+    })
+
+
+@api.route('/campus/api/v1/get_all_universities', methods=["POST"])
 def get_all_universities():
     data = request.json
     api_key = data.get('api_key')
@@ -371,5 +905,211 @@ def get_all_universities():
         })
 
 
+@api.route('/campus/api/v1/leaderboard', methods=["POST"])
+def get_leaderboard():
+    data = request.json
+    api_key = data.get('api_key')
+    competence_id = data.get('competence_id')
+    university_id = data.get('university_id')
+    limit = int(data.get('limit', 20))
+    offset = int(data.get('offset', 0))
+
+    if limit < 1 or limit > 100 or offset < 0:
+        return (json.dumps({'message': "invalid pagination"}), 400, {
+            'message': "invalid pagination"
+        })
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    else:
+        result = LeaderboardsManager.get_leaderboard_as_json(competence_id, university_id, limit, offset)
+        return (result, 200, {
+            'message': "OK"
+        })
+
+
+@api.route('/campus/api/v1/leaderboard/my_position', methods=["POST"])
+def get_my_leaderboard_position():
+    data = request.json
+    api_key = data.get('api_key')
+    competence_id = data.get('competence_id')
+    my_university = bool(data.get('my_university', False))
+
+    account = CampusAccount.get_from_api_key(api_key)
+    if account is None:
+        return (json.dumps({'message': "account not found"}), 400, {
+            'message': "account not found"
+        })
+    else:
+        university_id = account.university_id if my_university else None
+        result = LeaderboardsManager.get_position_as_json(account.user_id, competence_id, university_id)
+        return (result, 200, {
+            'message': "OK"
+        })
+
+
+def batch_get_event(account: CampusAccount, params: dict) -> tuple[str, int]:
+    if account.role_id != 3 and account.role_id != 2:
+        return json.dumps({'message': "you don't have permission"}), 400
+    event = Event.get_by_id(params.get('event_id'))
+    if event is None:
+        return json.dumps({'message': "event not found"}), 400
+    return event.get_json_info(), 200
+
+
+def batch_get_suggested_events(account: CampusAccount, params: dict) -> tuple[str, int]:
+    event_ids = account.get_suggested_event_ids()
+    return json.dumps({"events": [{"event.id": event_id} for event_id in event_ids]}), 200
+
+
+# Read-only requests available in /batch: name -> handler(account, params) returning (json body, status).
+batch_handlers = {
+    "get_my_profile": lambda account, params: (account.account_info_json_self(), 200),
+    "get_all_indicators": lambda account, params: (IndicatorsManager.get_all_indicators_as_json(), 200),
+    "get_all_universities": lambda account, params: (UniversityManager.get_all_universities_as_json(), 200),
+    "get_event_list": lambda account, params: (EventsManager.get_event_list_as_json(), 200),
+    "get_event": batch_get_event,
+    "get_suggested_events": batch_get_suggested_events,
+    "get_event_reviews": lambda account, params: (EventReviewsManager.get_reviews_as_json(
+        params.get('event_id'), params.get('before_id'), min(max(int(params.get('limit', 20)), 1), 100)), 200),
+    "chats/list": lambda account, params: (ChatsManager.get_chats_as_json(account.user_id), 200),
+    "leaderboard": lambda account, params: (LeaderboardsManager.get_leaderboard_as_json(
+        params.get('competence_id'), params.get('university_id'), min(max(int(params.get('limit', 20)), 1), 100),
+        max(int(params.get('offset', 0)), 0)), 200),
+}
+
+
+def run_batch_request(account: CampusAccount, sub_request: dict) -> str:
+    handler = batch_handlers.get(sub_request.get('method'))
+    if handler is None:
+        body, status = json.dumps({'message': "unknown method"}), 404
+    else:
+        try:
+            body, status = handler(account, sub_request.get('params') or {})
+        except Exception as e:
+            current_app.logger.exception(e)
+            body, status = json.dumps({'message': "internal error"}), 500
+    return f'{{"id": {json.dumps(sub_request.get("id"))}, "status": {status}, "body": {body}}}'
+
+
+@api.route('/campus/api/v1/batch', methods=["POST"])
+def batch():
+    data = request.json
+    api_key = data.get('api_key')
+    sub_requests = data.get('requests')
+    parallel = bool(data.get('parallel', False))
+
+    if not isinstance(sub_requests, list) or not all(isinstance(sub, dict) for sub in sub_requests):
+        return (json.dumps({'message': "requests must be a list of objects"}), 400, {
+            'message': "requests must be a list of objects"
+        })
+    if len(sub_requests) > 20:
+        return (json.dumps({'message': "too many requests"}), 400, {
+            'message': "too many requests"
+        })
+
+    if parallel:
+        # Independent reads on their own connections, without a shared snapshot.
+        account = CampusAccount.get_from_api_key(api_key)
+        if account is None:
+            return (json.dumps({'message': "account not found"}), 400, {
+                'message': "account not found"
+            })
+        db_path, university_id = partitions.current_db_path(), partitions.current_university()
+        # Worker threads have no application context of their own, handlers and error logging need one.
+        app = current_app._get_current_object()
+
+        def run_in_partition(sub: dict) -> str:
+            with app.app_context(), partitions.use_database(db_path, university_id):
+                return run_batch_request(account, sub)
+
+        with ThreadPoolExecutor(max_workers=len(sub_requests) or 1) as pool:
+            results = list(pool.map(run_in_partition, sub_requests))
+    else:
+        with dbmanager.read_snapshot():
+            account = CampusAccount.get_from_api_key(api_key)
+            if account is None:
+                return (json.dumps({'message': "account not found"}), 400, {
+                    'message': "account not found"
+                })
+            results = [run_batch_request(account, sub) for sub in sub_requests]
+    return ('{"results": [' + ", ".join(results) + ']}', 200, {
+        'message': "OK"
+    })
+
+
+def warm_up():
+    """
+    Loads reference data caches and starts the database writer, so the first requests do not pay for it.
+    """
+    dbwriter.execute(lambda cursor: None)
+    RolesManager()
+    CompetenciesManager()
+    CompetenceLevelResolver.reload()
+    IndicatorsManager.get_all_indicators_as_json()
+    UniversityManager.get_all_universities_as_json()
+    for db_path in partitions.get_all_db_paths():
+        with partitions.use_database(db_path):
+            dbwriter.execute(lambda cursor: None)
+            LeaderboardsManager.refresh()
+
+
+def select_partition():
+    """
+    Routes the request to the partition of the university owning its API key or, for login, its email.
+    Registrations use the chosen university if it exists, other requests the partition of users without
+    a university.
+    """
+    data = request.get_json(silent=True) or request.form
+    found, university_id = dbmanager.get_partition_university(data.get('api_key'), data.get('email'))
+    if not found and str(data.get('university', '')).isdigit() and \
+            int(data.get('university')) in UniversityManager.get_university_ids():
+        university_id = int(data.get('university'))
+    g.partition = ExitStack()
+    g.partition.enter_context(partitions.use(university_id))
+
+
+def release_partition(exception: BaseException = None):
+    partition = g.pop('partition', None)
+    if partition is not None:
+        partition.close()
+
+
+def create_app(config: dict = None) -> Flask:
+    """
+    Creates the API application.
+
+    Parameters:
+    - config (dict): Flask config values overriding default_config.
+
+    Returns:
+    - Flask: The application, ready to accept traffic.
+    """
+    app = Flask(__name__)
+    app.config.update(default_config)
+    app.config.update(config or {})
+    app.register_blueprint(api)
+    if partitions.enabled():
+        app.before_request(select_partition)
+        app.teardown_request(release_partition)
+
+    if app.config["INIT_DB"]:
+        dbmanager.init_db()
+    if app.config["COMPRESSION"]:
+        ResponseCompressor(cacheable_endpoints={
+            "api.get_all_indicators", "api.get_all_universities", "api.get_event_list", "api.get_event",
+            "api.get_event_reviews"
+        }).register(app)
+    if app.config["WARM_UP"]:
+        warm_up()
+    if app.config["MAINTENANCE"]:
+        app.extensions["maintenance"] = MaintenanceScheduler()
+        app.extensions["maintenance"].start()
+    return app
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    create_app().run(host='0.0.0.0', port=5000, debug=False)
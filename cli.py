@@ -0,0 +1,166 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+import dbmanager
+import partitions
+import settings
+from data import CompetenceSettlement, TestResultsManager
+from imports import ImportManager
+from maintenance import MaintenanceScheduler, enable_incremental_vacuum
+from reports import ReportsManager
+
+
+def require_single_database(command: str):
+    if partitions.enabled():
+        sys.exit(f"{command} is not supported while partitioning is enabled")
+
+
+def settle_backlog(args: argparse.Namespace):
+    dbmanager.init_db()
+    credited = 0
+    for db_path in partitions.get_all_db_paths():
+        with partitions.use_database(db_path):
+            credited += CompetenceSettlement.settle_backlog(args.batch_size)
+    print(f"Credited {credited} attendees")
+
+
+def load_test_results(args: argparse.Namespace):
+    require_single_database("load-test-results")
+    dbmanager.init_db()
+    fmt = args.format or ("csv" if args.file.lower().endswith(".csv") else "ndjson")
+    with open(args.file, "r", encoding="utf-8-sig", newline="") as stream:
+        report = TestResultsManager.load_stream(stream, fmt, args.batch_size)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def export_report(args: argparse.Namespace):
+    if partitions.enabled() and args.university is None:
+        sys.exit("--university is required while partitioning is enabled")
+    with partitions.use(args.university), open(args.output, "wb") as file:
+        ReportsManager.write_report(args.report, file, args.university)
+    print(f"Saved {args.report} report to {args.output}")
+
+
+def import_file(args: argparse.Namespace):
+    require_single_database("import")
+    dbmanager.init_db()
+    report = ImportManager.import_file(args.kind, args.file, args.dry_run, args.batch_size, args.workers)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+startup_probe = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app({"WARM_UP": %(warm_up)s})
+created = time.perf_counter()
+client = application.test_client()
+if %(api_key)r:
+    response = client.post("/campus/api/v1/get_all_universities", json={"api_key": %(api_key)r})
+else:
+    response = client.get("/campus/api/v1/health")
+answered = time.perf_counter()
+print(json.dumps({"import": imported - started, "create_app": created - imported, "first_request": answered - created,
+                  "status": response.status_code}))
+"""
+
+
+def bench_startup(args: argparse.Namespace):
+    for warm_up in (False, True):
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run([sys.executable, "-c", startup_probe % {"warm_up": warm_up, "api_key": args.api_key}],
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        medians = {phase: statistics.median(run[phase] for run in runs) * 1000
+                   for phase in ("import", "create_app", "first_request")}
+        print(f"warm_up={warm_up}: " + ", ".join(f"{phase} {ms:.1f} ms" for phase, ms in medians.items()) +
+              f", total {sum(medians.values()):.1f} ms (median of {args.runs})")
+
+
+def run_maintenance(args: argparse.Namespace):
+    dbmanager.init_db()
+    MaintenanceScheduler().run_all()
+
+
+def switch_to_incremental_vacuum(args: argparse.Namespace):
+    enable_incremental_vacuum()
+    print("auto_vacuum is now INCREMENTAL")
+
+
+def partition_database(args: argparse.Namespace):
+    require_single_database("partition-db")
+    dbmanager.init_db()
+    target_dir = args.dir or settings.get_partitioning_settings().get("dir", "./db/universities")
+    users = partitions.split_database(target_dir)
+    for name, count in users.items():
+        print(f"{name}: {count} users")
+    print(f'Set "partitioning": {{"enabled": true, "dir": "{target_dir}"}} in settings.json to use the partitions')
+
+
+def query_budget(args: argparse.Namespace):
+    import querybudget
+
+    if not querybudget.run():
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Campus API maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    settle = commands.add_parser("settle-backlog", help="credit competence points for all past attended events")
+    settle.add_argument("--batch-size", type=int, default=50, help="events settled per transaction")
+    settle.set_defaults(handler=settle_backlog)
+
+    tests = commands.add_parser("load-test-results", help="load test results from an NDJSON or CSV file")
+    tests.add_argument("file", help="path to the .ndjson or .csv file")
+    tests.add_argument("--format", choices=("ndjson", "csv"), help="file format, guessed from the extension by default")
+    tests.add_argument("--batch-size", type=int, default=1000, help="rows inserted per transaction")
+    tests.set_defaults(handler=load_test_results)
+
+    report = commands.add_parser("report", help="export an XLSX report")
+    report.add_argument("report", choices=ReportsManager.reports)
+    report.add_argument("output", help="path to the .xlsx file")
+    report.add_argument("--university", type=int, help="only include users of this university")
+    report.set_defaults(handler=export_report)
+
+    bulk_import = commands.add_parser("import", help="import users or events from an XLSX or CSV file")
+    bulk_import.add_argument("kind", choices=ImportManager.kinds)
+    bulk_import.add_argument("file", help="path to the .xlsx or .csv file")
+    bulk_import.add_argument("--dry-run", action="store_true", help="only validate the file and print the report")
+    bulk_import.add_argument("--batch-size", type=int, default=1000, help="rows inserted per transaction")
+    bulk_import.add_argument("--workers", type=int, help="processes hashing passwords, number of CPUs by default")
+    bulk_import.set_defaults(handler=import_file)
+
+    bench = commands.add_parser("bench-startup", help="measure cold start: import, create_app and first request")
+    bench.add_argument("--runs", type=int, default=5, help="fresh processes per configuration")
+    bench.add_argument("--api-key", help="measure get_all_universities instead of health as the first request")
+    bench.set_defaults(handler=bench_startup)
+
+    maintenance = commands.add_parser("maintenance", help="run every database maintenance task once")
+    maintenance.set_defaults(handler=run_maintenance)
+
+    vacuum = commands.add_parser("enable-incremental-vacuum",
+                                 help="switch the database to incremental vacuum (full VACUUM, stop the API first)")
+    vacuum.set_defaults(handler=switch_to_incremental_vacuum)
+
+    partition = commands.add_parser("partition-db",
+                                    help="split the main database into per-university files (stop the API first)")
+    partition.add_argument("--dir", help="directory for the new files, the partitioning dir in settings by default")
+    partition.set_defaults(handler=partition_database)
+
+    budget = commands.add_parser("query-budget",
+                                 help="check SQL statements per endpoint against budgets on a seeded database copy")
+    budget.set_defaults(handler=query_budget)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import importlib
+import importlib.util
+import threading
+from collections import OrderedDict
+
+from flask import Flask, Response, request
+
+# Optional compression modules by encoding. They are imported on first use, not at startup.
+optional_encoders = {"zstd": "zstandard", "br": "brotli"}
+
+# Bodies smaller than this are sent as is, compressing them does not pay off.
+min_size = 1024
+
+
+class CompressedBodiesCache:
+    """
+    LRU cache of compressed bodies, keyed by the encoding and the SHA-256 digest of the uncompressed body.
+    Hashing a body is much cheaper than compressing it again.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.__size = 0
+        self.__bodies: OrderedDict[tuple[str, bytes], bytes] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: tuple[str, bytes]) -> bytes | None:
+        with self.__lock:
+            body = self.__bodies.get(key)
+            if body is not None:
+                self.__bodies.move_to_end(key)
+            return body
+
+    def put(self, key: tuple[str, bytes], body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self.__lock:
+            if key in self.__bodies:
+                return
+            self.__bodies[key] = body
+            self.__size += len(body)
+            while self.__size > self.max_bytes:
+                _, evicted = self.__bodies.popitem(last=False)
+                self.__size -= len(evicted)
+
+
+class ResponseCompressor:
+    """
+    Compresses responses with the best encoding accepted by the client: zstd and br when their modules are
+    installed, gzip otherwise. Responses of cacheable endpoints are compressed harder once and then served
+    from CompressedBodiesCache.
+
+    Attributes:
+        cacheable_endpoints (set[str]): Flask endpoint names whose bodies are cached compressed.
+    """
+
+    def __init__(self, cacheable_endpoints: set[str] = None, cache: CompressedBodiesCache = None):
+        self.cacheable_endpoints = cacheable_endpoints or set()
+        self.cache = cache or CompressedBodiesCache()
+        self.encodings = [encoding for encoding, module in optional_encoders.items()
+                          if importlib.util.find_spec(module) is not None] + ["gzip"]
+
+    def register(self, app: Flask):
+        app.after_request(self.compress_response)
+
+    def choose_encoding(self) -> str | None:
+        accepted = request.accept_encodings
+        best, best_quality = None, 0
+        for encoding in self.encodings:
+            quality = accepted.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    @classmethod
+    def compress(cls, body: bytes, encoding: str, strong: bool = False) -> bytes:
+        if encoding == "zstd":
+            zstandard = importlib.import_module("zstandard")
+            return zstandard.ZstdCompressor(level=19 if strong else 3).compress(body)
+        if encoding == "br":
+            brotli = importlib.import_module("brotli")
+            return brotli.compress(body, quality=11 if strong else 5)
+        return gzip.compress(body, compresslevel=9 if strong else 6)
+
+    def compress_response(self, response: Response) -> Response:
+        # Caches must key every response by Accept-Encoding, 304 revalidations included.
+        response.vary.add("Accept-Encoding")
+        if response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers \
+                or not 200 <= response.status_code < 300 or response.status_code == 204:
+            return response
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        encoding = self.choose_encoding()
+        if encoding is None:
+            return response
+
+        if request.endpoint in self.cacheable_endpoints:
+            key = (encoding, hashlib.sha256(body).digest())
+            compressed = self.cache.get(key)
+            if compressed is None:
+                compressed = self.compress(body, encoding, strong=True)
+                self.cache.put(key, compressed)
+        else:
+            compressed = self.compress(body, encoding)
+
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        return response
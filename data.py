@@ -1,11 +1,15 @@
+import bisect
+import csv
 import json
+import re
 import sqlite3
+import threading
 from datetime import datetime
-from time import strptime
-from typing import Union
+from typing import Union, IO, Iterator
 
 import dbmanager
-import settings
+import dbwriter
+import partitions
 
 import utils
 
@@ -17,18 +21,37 @@ class University:
 
 
 class UniversityManager:
+    __json_cache: str | None = None
+    __ids_cache: frozenset[int] | None = None
+
+    @classmethod
+    def get_university_ids(cls) -> frozenset[int]:
+        """
+        Returns the IDs of all universities, loaded once and cached for the lifetime of the process.
+        """
+        if cls.__ids_cache is not None:
+            return cls.__ids_cache
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM univercities")
+            cls.__ids_cache = frozenset(university_id for university_id, in cursor.fetchall())
+            return cls.__ids_cache
 
     @classmethod
     def get_all_universities_as_json(cls) -> str:
         """
         Returns a JSON string containing all universities from the database.
+        The list is loaded once and cached for the lifetime of the process.
         """
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        if cls.__json_cache is not None:
+            return cls.__json_cache
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT name, id FROM univercities")
             result = cursor.fetchall()
-            return json.dumps(
+            cls.__json_cache = json.dumps(
                 [{"name": name, "university_id": university_id} for name, university_id in result])
+            return cls.__json_cache
 
 
 class Indicator:
@@ -42,7 +65,7 @@ class Indicator:
         """
         Returns the indicator with the given ID.
         """
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT name, type FROM indicators WHERE id = ?", (indicator_id,))
             result = cursor.fetchone()
@@ -52,6 +75,8 @@ class Indicator:
 
 
 class IndicatorsManager:
+    __json_cache: str | None = None
+
     def __init__(self, indicators: list):
         self.indicators = indicators
 
@@ -59,14 +84,18 @@ class IndicatorsManager:
     def get_all_indicators_as_json(cls) -> str:
         """
         Returns a JSON string containing all indicators from the database.
+        The list is loaded once and cached for the lifetime of the process.
         """
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        if cls.__json_cache is not None:
+            return cls.__json_cache
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT name, indicator_id, type FROM indicators")
+            cursor.execute("SELECT name, id, type FROM indicators")
             result = cursor.fetchall()
-            return json.dumps(
+            cls.__json_cache = json.dumps(
                 [{"name": name, "indicator_id": indicator_id, "type": bool(ind_type)} for name, indicator_id, ind_type
                  in result])
+            return cls.__json_cache
 
 
 class Event:
@@ -82,10 +111,11 @@ class Event:
         organizer_id (int): The unique identifier of the event organizer.
         verified (int): A flag indicating whether the event has been verified.
         relative_image_path (str): The relative path to the image representing the event.
+        rating (dict): The average rating, the number of reviews and the stars histogram.
     """
 
     def __init__(self, name: str, event_id: int, organizer_id: int, verified: int, date: datetime, address: str,
-                 description: str, indicators: list[Indicator]):
+                 description: str, indicators: list[Indicator], rating: dict = None):
         self.event_id = event_id
         self.date = date
         self.name = name
@@ -95,6 +125,7 @@ class Event:
         self.verified = verified
         self.relative_image_path = self.__get_relative_picture_path()
         self.indicators = indicators
+        self.rating = rating if rating is not None else EventReviewsManager.rating_from_stats(None)
 
     def get_json_info(self) -> str:
         return json.dumps({
@@ -107,31 +138,40 @@ class Event:
             "verified": self.verified,
             "indicators": [{"indicator_id": indicator.indicator_id, "name": indicator.name} for indicator in
                            self.indicators],
+            "rating": self.rating,
             "preview_picture": utils.CryptUtils.image_to_base64(self.relative_image_path)
+            if self.relative_image_path is not None else None
         })
 
     def __get_relative_picture_path(self) -> str | None:
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "SELECT path_to_picture FROM events_pictures WHERE event_id =?",
                 (self.event_id,))
             result = cursor.fetchone()
-            return result[0]
+            return result[0] if result is not None else None
 
     @classmethod
     def get_by_id(cls, event_id: int) -> Union["Event", None]:
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT organizer_id, verified, date, address, name, description FROM events WHERE id = ?",
+                "SELECT e.organizer_id, e.verified, e.date, e.address, e.name, e.description, "
+                f"{EventReviewsManager.stats_columns} FROM events e "
+                "LEFT JOIN event_rating_stats s ON s.event_id = e.id WHERE e.id = ?",
                 (event_id,))
             result = cursor.fetchone()
             if result is None:
                 return None
-            organizer_id, verified, date, address, name, description = result
-            return cls(name, event_id, organizer_id, verified, strptime(date, "%Y-%m-%d %H:%M:%S"), address,
-                       description)
+            organizer_id, verified, date, address, name, description = result[:6]
+            cursor.execute(
+                "SELECT i.name, i.id, i.type FROM events_indicators ei JOIN indicators i ON i.id = ei.indicator_id "
+                "WHERE ei.event_id = ?", (event_id,))
+            indicators = [Indicator(ind_name, indicator_id, bool(ind_type))
+                          for ind_name, indicator_id, ind_type in cursor.fetchall()]
+            return cls(name, event_id, organizer_id, verified, datetime.strptime(date, "%Y-%m-%d %H:%M:%S"),
+                       address, description, indicators, EventReviewsManager.rating_from_stats(result[6:]))
 
 
 class EventsManager:
@@ -148,28 +188,137 @@ class EventsManager:
         Raises:
         - sqlite3.DatabaseError: If there is an error with the database.
         """
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT id, organizer_id, verified, date, address, name, description FROM events")
+                "SELECT e.id, e.organizer_id, e.verified, e.date, e.address, e.name, e.description, "
+                f"{EventReviewsManager.stats_columns} FROM events e "
+                "LEFT JOIN event_rating_stats s ON s.event_id = e.id")
             result = cursor.fetchall()
             return json.dumps([{"event_id": event_id, "organizer_id": organizer_id, "verified": verified,
-                                "date": date.strftime("%Y-%m-%d %H:%M:%S"), "address": address,
-                                "name": name, "description": description} for
-                               event_id, organizer_id, verified, date, address, name, description in result])
+                                "date": date, "address": address, "name": name, "description": description,
+                                "rating": EventReviewsManager.rating_from_stats(stats)} for
+                               event_id, organizer_id, verified, date, address, name, description, *stats in result])
+
+    @classmethod
+    def search_events_as_json(cls, query: str, indicator_id: int = None, verified: int = None, limit: int = 20,
+                              offset: int = 0) -> str:
+        """
+        Searches events by name, description and address using the FTS5 index, best matches first.
+
+        Parameters:
+        - query (str): Free text query. Every word is matched as a prefix, so partial Cyrillic words match too.
+        - indicator_id (int): If provided, only events linked to this indicator are returned.
+        - verified (int): If provided, only events with this verification status are returned.
+        - limit (int): The maximum number of events in the page.
+        - offset (int): The number of matching events to skip.
+
+        Returns:
+        - str: A JSON string with the page of events and the pagination parameters.
+
+        Raises:
+        - sqlite3.DatabaseError: If there is an error with the database.
+        """
+        words = re.findall(r"\w+", query)
+        events = []
+        if words:
+            match = " ".join(f'"{word}"*' for word in words)
+            sql = ("SELECT e.id, e.organizer_id, e.verified, e.date, e.address, e.name, e.description "
+                   "FROM events_fts JOIN events e ON e.id = events_fts.rowid WHERE events_fts MATCH ?")
+            params: list = [match]
+            if indicator_id is not None:
+                sql += " AND e.id IN (SELECT event_id FROM events_indicators WHERE indicator_id = ?)"
+                params.append(indicator_id)
+            if verified is not None:
+                sql += " AND e.verified = ?"
+                params.append(verified)
+            sql += " ORDER BY bm25(events_fts, 10.0, 1.0, 3.0) LIMIT ? OFFSET ?"
+            params += [limit, offset]
+
+            with dbmanager.read_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                events = [{"event_id": event_id, "organizer_id": organizer_id, "verified": verified,
+                           "date": date, "address": address, "name": name, "description": description} for
+                          event_id, organizer_id, verified, date, address, name, description in cursor.fetchall()]
+        return json.dumps({"events": events, "limit": limit, "offset": offset})
+
+    # Values of events.verified: new events wait for moderation, moderators verify or reject them.
+    unverified, verified, rejected = 0, 1, -1
 
     @classmethod
     def verify_event(cls, event_id: int):
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        cls.decide_events([event_id], [])
+
+    @classmethod
+    def get_moderation_queue_as_json(cls, after_date: str = None, after_id: int = None, limit: int = 50) -> str:
+        """
+        Returns a page of events waiting for moderation, earliest first, read through the events (verified, date)
+        index.
+
+        Parameters:
+        - after_date (str), after_id (int): The "next" cursor of the previous page, None for the first page.
+        - limit (int): The maximum number of events in the page.
+
+        Returns:
+        - str: A JSON string with the page of events and the cursor of the next page (None on the last page).
+
+        Raises:
+        - sqlite3.DatabaseError: If there is an error with the database.
+        """
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("UPDATE events SET verified = 1 WHERE id = ?", (event_id,))
-            conn.commit()
+            sql = ("SELECT id, organizer_id, date, address, name, description FROM events "
+                   "WHERE verified = ?")
+            params: list = [cls.unverified]
+            if after_id is not None and after_date is None:
+                # Events without a date come first.
+                sql += " AND (date IS NULL AND id > ? OR date IS NOT NULL)"
+                params.append(after_id)
+            elif after_id is not None:
+                sql += " AND (date, id) > (?, ?)"
+                params += [after_date, after_id]
+            cursor.execute(sql + " ORDER BY date, id LIMIT ?", params + [limit])
+            events = [{"event_id": event_id, "organizer_id": organizer_id, "date": date, "address": address,
+                       "name": name, "description": description} for
+                      event_id, organizer_id, date, address, name, description in cursor.fetchall()]
+        next_cursor = None
+        if len(events) == limit:
+            next_cursor = {"after_date": events[-1]["date"], "after_id": events[-1]["event_id"]}
+        return json.dumps({"events": events, "next": next_cursor})
+
+    @classmethod
+    def decide_events(cls, verify_ids: list[int], reject_ids: list[int]) -> dict:
+        """
+        Verifies and rejects events waiting for moderation with a single statement, which also bumps the versions
+        of the changed events, so their ETags and everything derived from the verified flag change at once.
+        Suggested events are read from the verified flag directly. Events that were already decided are skipped.
+
+        Returns:
+        - dict: The number of events verified and rejected.
+
+        Raises:
+        - sqlite3.DatabaseError: If there is an error with the database.
+        """
+        def job(cursor: sqlite3.Cursor) -> dict:
+            cursor.execute(
+                "UPDATE events SET verified = CASE WHEN id IN (SELECT value FROM json_each(:verify)) "
+                "THEN :verified ELSE :rejected END, version = version + 1, updated_at = CURRENT_TIMESTAMP "
+                "WHERE verified = :unverified AND (id IN (SELECT value FROM json_each(:verify)) "
+                "OR id IN (SELECT value FROM json_each(:reject))) RETURNING verified",
+                {"verify": json.dumps(verify_ids), "reject": json.dumps(reject_ids), "verified": cls.verified,
+                 "rejected": cls.rejected, "unverified": cls.unverified})
+            decisions = [row[0] for row in cursor.fetchall()]
+            return {"verified": decisions.count(cls.verified), "rejected": decisions.count(cls.rejected)}
+
+        return dbwriter.execute(job)
 
     @classmethod
     def edit_event(cls, event_id: int, name: str = None, description: str = None, date: datetime = None,
                    address: str = None,
                    relative_pic_path: str = None,
-                   indicators: list[Indicator] = None
+                   indicators: list[Indicator] = None,
+                   capacity: int = None
                    ):
         """
         Edits an event in the database.
@@ -181,6 +330,7 @@ class EventsManager:
         - date (datetime): The new date and time of the event. If not provided, the current date and time will remain unchanged.
         - address (str): The new address of the event location. If not provided, the current address will remain unchanged.
         - relative_pic_path (str): The new relative path of the event's picture. If not provided, the current relative path will remain unchanged.
+        - capacity (int): The new maximum number of approved participants. If not provided, the current capacity will remain unchanged.
 
         Returns:
         - None: This method does not return any value.
@@ -188,8 +338,8 @@ class EventsManager:
         Raises:
         - sqlite3.DatabaseError: If there is an error with the database.
         """
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
-            cursor = conn.cursor()
+
+        def job(cursor: sqlite3.Cursor):
             if name is not None:
                 cursor.execute("UPDATE events SET name = ? WHERE id = ?", (name, event_id))
             if description is not None:
@@ -199,16 +349,18 @@ class EventsManager:
                                (date.strftime("%Y-%m-%d %H:%M:%S"), event_id))
             if address is not None:
                 cursor.execute("UPDATE events SET address = ? WHERE id = ?", (address, event_id))
+            if capacity is not None:
+                cursor.execute("UPDATE events SET capacity = ? WHERE id = ?", (capacity, event_id))
             if relative_pic_path is not None:
                 cursor.execute("UPDATE events_pictures SET path_to_picture = ? WHERE event_id = ?",
                                (relative_pic_path, event_id))
             if indicators is not None:
-                cursor.execute("DELETE FROM indicators_events WHERE event_id =?", (event_id,))
-                for indicator in indicators:
-                    cursor.execute("INSERT INTO indicators_events (indicator_id, event_id) VALUES (?,?)",
-                                   (indicator.indicator_id, event_id))
+                cursor.execute("DELETE FROM events_indicators WHERE event_id =?", (event_id,))
+                cursor.executemany("INSERT INTO events_indicators (indicator_id, event_id) VALUES (?,?)",
+                                   [(indicator.indicator_id, event_id) for indicator in indicators])
+            dbmanager.bump_event_version(cursor, event_id)
 
-            conn.commit()
+        dbwriter.execute(job)
 
     @classmethod
     def add_event(cls, name: str, description: str, date: datetime, address: str, relative_pic_path: str,
@@ -229,23 +381,610 @@ class EventsManager:
         Raises:
         - sqlite3.DatabaseError: If there is an error with the database.
         """
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+
+        # IDs are allocated in the common database when partitioning is enabled, so they stay unique.
+        partition_event_id = dbmanager.register_partition_event(partitions.current_university()) \
+            if partitions.enabled() else None
+
+        def job(cursor: sqlite3.Cursor) -> int:
+            cursor.execute(
+                "INSERT INTO events (id, name, description, date, address, verified, organizer_id) "
+                "VALUES (?,?,?,?,?,0,?)",
+                (partition_event_id, name, description, date.strftime("%Y-%m-%d %H:%M:%S"), address, organizer_id))
+            event_id = cursor.lastrowid
+
+            cursor.execute("INSERT INTO events_pictures (id, path_to_picture, event_id) VALUES (?, ?, ?)",
+                           (event_id, relative_pic_path, event_id,))
+            return event_id
+
+        return dbwriter.execute(job)
+
+
+class EventReviewsManager:
+    """
+    Reviews of events stored in reports_about_events.
+
+    Per-event review count, stars sum and histogram live in event_rating_stats and are kept up to date by
+    triggers on reports_about_events, so ratings are read with a primary key lookup instead of aggregating reviews.
+    """
+    stats_columns = "s.reviews_count, s.stars_sum, s.stars_1, s.stars_2, s.stars_3, s.stars_4, s.stars_5"
+
+    @classmethod
+    def rating_from_stats(cls, stats: tuple | list | None) -> dict:
+        """
+        Builds the rating from a row of stats_columns. Rows of events without reviews may be None or all NULL.
+        """
+        if not stats or stats[0] is None:
+            stats = (0, 0, 0, 0, 0, 0, 0)
+        reviews_count, stars_sum, *histogram = stats
+        return {"average": round(stars_sum / reviews_count, 2) if reviews_count else None,
+                "reviews_count": reviews_count,
+                "histogram": {str(stars): count for stars, count in enumerate(histogram, 1)}}
+
+    @classmethod
+    def add_review(cls, event_id: int, user_id: int, stars: int, text: str = None) -> int:
+        """
+        Adds the user's review of the event, replacing the previous review of the same user.
+
+        Returns:
+        - int: The ID of the review.
+
+        Raises:
+        - sqlite3.DatabaseError: If there is an error with the database.
+        """
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        def job(cursor: sqlite3.Cursor) -> int:
+            dbmanager.bump_event_version(cursor, event_id)
+            cursor.execute("SELECT id FROM reports_about_events WHERE event_id = ? AND user_id = ?",
+                           (event_id, user_id))
+            result = cursor.fetchone()
+            if result is not None:
+                cursor.execute("UPDATE reports_about_events SET stars = ?, text = ?, created_at = ? WHERE id = ?",
+                               (stars, text, created_at, result[0]))
+                return result[0]
+            cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM reports_about_events")
+            review_id = cursor.fetchone()[0]
+            cursor.execute(
+                "INSERT INTO reports_about_events (id, event_id, user_id, stars, text, created_at) "
+                "VALUES (?,?,?,?,?,?)", (review_id, event_id, user_id, stars, text, created_at))
+            return review_id
+
+        return dbwriter.execute(job)
+
+    @classmethod
+    def get_reviews_as_json(cls, event_id: int, before_id: int = None, limit: int = 20) -> str:
+        """
+        Returns a page of the event's reviews, newest first, with the event rating.
+
+        Parameters:
+        - event_id (int): The ID of the event.
+        - before_id (int): The next_before_id of the previous page, None for the first page.
+        - limit (int): The maximum number of reviews in the page.
+
+        Returns:
+        - str: A JSON string with the rating, the reviews and next_before_id (None on the last page).
+        """
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "INSERT INTO events (name, description, date, address, verified, organizer_id) VALUES (?,?,?,?,0,?)",
-                (name, description, date.strftime("%Y-%m-%d %H:%M:%S"), address, organizer_id))
+                "SELECT id, user_id, stars, text, created_at FROM reports_about_events "
+                "WHERE event_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (event_id, before_id if before_id is not None else 2 ** 63 - 1, limit))
+            reviews = [{"review_id": review_id, "user_id": user_id, "stars": stars, "text": text,
+                        "created_at": created_at} for review_id, user_id, stars, text, created_at in
+                       cursor.fetchall()]
+            cursor.execute(f"SELECT {cls.stats_columns} FROM event_rating_stats s WHERE s.event_id = ?",
+                           (event_id,))
+            rating = cls.rating_from_stats(cursor.fetchone())
+        return json.dumps({"rating": rating, "reviews": reviews,
+                           "next_before_id": reviews[-1]["review_id"] if len(reviews) == limit else None})
+
+
+class EventRequestsManager:
+    """
+    Requests of users to take part in events, stored in to_events_user_requests.
+
+    A request is "pending", "approved", "rejected" or "cancelled". events.approved_count counts approved requests
+    and is updated in the same transaction as the requests, so the capacity check never counts rows.
+    """
 
-            conn.commit()
+    @classmethod
+    def join(cls, event_id: int, user_id: int) -> str:
+        """
+        Creates a pending request of the user, or makes a cancelled or rejected request pending again.
+
+        Returns:
+        - str: The status of the request after the call.
+        """
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+        def job(cursor: sqlite3.Cursor) -> str:
+            cursor.execute("SELECT id, status FROM to_events_user_requests WHERE event_id = ? AND user_id = ?",
+                           (event_id, user_id))
+            result = cursor.fetchone()
+            if result is None:
+                cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM to_events_user_requests")
+                cursor.execute(
+                    "INSERT INTO to_events_user_requests (id, event_id, user_id, status, created_at) "
+                    "VALUES (?,?,?,'pending',?)", (cursor.fetchone()[0], event_id, user_id, created_at))
+                return "pending"
+            request_id, status = result
+            if status in ("cancelled", "rejected"):
+                cursor.execute(
+                    "UPDATE to_events_user_requests SET status = 'pending', created_at = ? WHERE id = ?",
+                    (created_at, request_id))
+                return "pending"
+            return status
+
+        return dbwriter.execute(job)
+
+    @classmethod
+    def cancel(cls, event_id: int, user_id: int) -> bool:
+        """
+        Cancels the user's pending or approved request, releasing the place if it was approved.
+
+        Returns:
+        - bool: Whether there was a request to cancel.
+        """
+
+        def job(cursor: sqlite3.Cursor) -> bool:
+            cursor.execute("SELECT id, status FROM to_events_user_requests WHERE event_id = ? AND user_id = ?",
+                           (event_id, user_id))
+            result = cursor.fetchone()
+            if result is None or result[1] not in ("pending", "approved"):
+                return False
+            cursor.execute("UPDATE to_events_user_requests SET status = 'cancelled' WHERE id = ?", (result[0],))
+            if result[1] == "approved":
+                cursor.execute("UPDATE events SET approved_count = approved_count - 1 WHERE id = ?", (event_id,))
+            return True
+
+        return dbwriter.execute(job)
+
+    @classmethod
+    def review(cls, event_id: int, approve: list[int], reject: list[int]) -> dict:
+        """
+        Approves and rejects pending requests of the given users in bulk, one statement each.
+        Requests are approved in the order they were made while places are left, the rest stay pending.
+
+        Returns:
+        - dict: The number of approved and rejected requests and the number of places left (None if unlimited).
+        """
+
+        def job(cursor: sqlite3.Cursor) -> dict:
+            cursor.execute("SELECT capacity, approved_count FROM events WHERE id = ?", (event_id,))
+            capacity, approved_count = cursor.fetchone()
+            places = -1 if capacity is None else max(capacity - approved_count, 0)
+            cursor.execute(
+                "UPDATE to_events_user_requests SET status = 'approved' WHERE id IN ("
+                "SELECT id FROM to_events_user_requests WHERE event_id = ? AND status = 'pending' "
+                "AND user_id IN (SELECT value FROM json_each(?)) ORDER BY id LIMIT ?)",
+                (event_id, json.dumps(approve), places))
+            approved = cursor.rowcount
+            cursor.execute("UPDATE events SET approved_count = approved_count + ? WHERE id = ?",
+                           (approved, event_id))
+            cursor.execute(
+                "UPDATE to_events_user_requests SET status = 'rejected' WHERE event_id = ? AND status = 'pending' "
+                "AND user_id IN (SELECT value FROM json_each(?))",
+                (event_id, json.dumps(reject)))
+            return {"approved": approved, "rejected": cursor.rowcount,
+                    "places_left": None if capacity is None else max(capacity - approved_count - approved, 0)}
+
+        return dbwriter.execute(job)
+
+    @classmethod
+    def get_requests_as_json(cls, event_id: int, status: str = "pending", after_id: int = 0,
+                             limit: int = 100) -> str:
+        """
+        Returns a page of the event's requests with the given status, oldest first.
+
+        Returns:
+        - str: A JSON string with the requests and next_after_id (None on the last page).
+        """
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, user_id, status, created_at FROM to_events_user_requests "
+                "WHERE event_id = ? AND status = ? AND id > ? ORDER BY id LIMIT ?",
+                (event_id, status, after_id, limit))
+            requests = [{"request_id": request_id, "user_id": user_id, "status": request_status,
+                         "created_at": created_at} for request_id, user_id, request_status, created_at in
+                        cursor.fetchall()]
+        return json.dumps({"requests": requests,
+                           "next_after_id": requests[-1]["request_id"] if len(requests) == limit else None})
+
+
+class ChatNotifier:
+    """
+    Wakes up requests waiting for new messages in a chat.
+
+    Keeps the ID of the last message sent in every chat of this process. Waiting requests sleep on a condition
+    and are woken up when a message is sent, so they do not poll the database.
+    """
+    __condition = threading.Condition()
+    __last_message_ids: dict[int, int] = {}
+
+    @classmethod
+    def notify(cls, chat_id: int, message_id: int):
+        with cls.__condition:
+            cls.__last_message_ids[chat_id] = max(message_id, cls.__last_message_ids.get(chat_id, 0))
+            cls.__condition.notify_all()
+
+    @classmethod
+    def wait(cls, chat_id: int, after_id: int, timeout: float) -> bool:
+        """
+        Waits until a message newer than after_id is sent to the chat by this process or the timeout expires.
+
+        Returns:
+        - bool: Whether a newer message was sent.
+        """
+        with cls.__condition:
+            return cls.__condition.wait_for(lambda: cls.__last_message_ids.get(chat_id, 0) > after_id, timeout)
+
+
+class ChatsManager:
+    """
+    Personal chats between two users, stored in chats, chat_messages and message.
+    """
+
+    @classmethod
+    def open_chat(cls, user_id: int, other_user_id: int) -> int:
+        """
+        Returns the ID of the chat between two users, creating it if needed.
+        """
+
+        def job(cursor: sqlite3.Cursor) -> int:
             cursor.execute(
-                "SELECT id FROM events WHERE name = ? AND description =? AND date =? AND address =?",
-                (name, description, date.strftime("%Y-%m-%d %H:%M:%S"), address, relative_pic_path))
+                "SELECT id FROM chats WHERE (user1 = ? AND user2 = ?) OR (user1 = ? AND user2 = ?)",
+                (user_id, other_user_id, other_user_id, user_id))
             result = cursor.fetchone()
+            if result is not None:
+                return result[0]
+            cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM chats")
+            chat_id = cursor.fetchone()[0]
+            cursor.execute("INSERT INTO chats (id, user1, user2) VALUES (?,?,?)", (chat_id, user_id, other_user_id))
+            return chat_id
 
-            cursor.execute("INSERT INTO events_pictures (id, path_to_picture, event_id) VALUES (?, ?)",
-                           (result[0], relative_pic_path, result[0],))
-            conn.commit()
-            return result[0]
+        return dbwriter.execute(job)
+
+    @classmethod
+    def is_member(cls, chat_id: int, user_id: int) -> bool:
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM chats WHERE id = ? AND (user1 = ? OR user2 = ?)",
+                           (chat_id, user_id, user_id))
+            return cursor.fetchone() is not None
+
+    @classmethod
+    def get_chats_as_json(cls, user_id: int) -> str:
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT c.id, CASE WHEN c.user1 = ? THEN c.user2 ELSE c.user1 END, "
+                "(SELECT MAX(cm.message_id) FROM chat_messages cm WHERE cm.chat_id = c.id) "
+                "FROM chats c WHERE c.user1 = ? OR c.user2 = ?",
+                (user_id, user_id, user_id))
+            return json.dumps([{"chat_id": chat_id, "user_id": other_user_id, "last_message_id": last_message_id}
+                               for chat_id, other_user_id, last_message_id in cursor.fetchall()])
+
+    @classmethod
+    def send_message(cls, chat_id: int, user_id: int, text: str) -> int:
+        """
+        Writes the message and links it to the chat in one transaction, then wakes up waiting requests.
+
+        Returns:
+        - int: The ID of the message.
+        """
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        def job(cursor: sqlite3.Cursor) -> int:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM message")
+            message_id = cursor.fetchone()[0]
+            cursor.execute("INSERT INTO message (id, text, timestamp, user_id) VALUES (?,?,?,?)",
+                           (message_id, text, timestamp, user_id))
+            cursor.execute("INSERT INTO chat_messages (id, chat_id, message_id) "
+                           "SELECT COALESCE(MAX(id), 0) + 1, ?, ? FROM chat_messages", (chat_id, message_id))
+            return message_id
+
+        message_id = dbwriter.execute(job)
+        ChatNotifier.notify(chat_id, message_id)
+        return message_id
+
+    @classmethod
+    def get_messages(cls, chat_id: int, before_id: int = None, after_id: int = None, limit: int = 50) -> list[dict]:
+        """
+        Returns messages of the chat using the (chat_id, message_id) index.
+        With before_id the page goes back in history, newest first; with after_id it contains
+        messages newer than after_id, oldest first.
+        """
+        if after_id is not None:
+            condition, order, bound = "cm.message_id > ?", "ASC", after_id
+        else:
+            condition, order, bound = "cm.message_id < ?", "DESC", before_id if before_id is not None else 2 ** 63 - 1
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT m.id, m.user_id, m.text, m.timestamp FROM chat_messages cm "
+                f"JOIN message m ON m.id = cm.message_id WHERE cm.chat_id = ? AND {condition} "
+                f"ORDER BY cm.message_id {order} LIMIT ?", (chat_id, bound, limit))
+            return [{"message_id": message_id, "user_id": user_id, "text": text, "timestamp": timestamp}
+                    for message_id, user_id, text, timestamp in cursor.fetchall()]
+
+    @classmethod
+    def get_history_as_json(cls, chat_id: int, before_id: int = None, limit: int = 50) -> str:
+        messages = cls.get_messages(chat_id, before_id=before_id, limit=limit)
+        return json.dumps({"messages": messages,
+                           "next_before_id": messages[-1]["message_id"] if len(messages) == limit else None})
+
+    @classmethod
+    def wait_for_messages_as_json(cls, chat_id: int, after_id: int, timeout: float, limit: int = 50) -> str:
+        """
+        Long poll: returns messages newer than after_id as soon as there are any, or an empty list on timeout.
+        """
+        messages = cls.get_messages(chat_id, after_id=after_id, limit=limit)
+        if not messages and ChatNotifier.wait(chat_id, after_id, timeout):
+            messages = cls.get_messages(chat_id, after_id=after_id, limit=limit)
+        return json.dumps({"messages": messages,
+                           "last_message_id": messages[-1]["message_id"] if messages else after_id})
+
+
+class CompetenceSettlement:
+    """
+    Credits competence points of attended events to users.
+
+    Every credited (event, user) pair is recorded in the events_settlements ledger, so settling the same event
+    again only credits attendees that were not settled before. Points are moved with set-based statements inside
+    a single writer transaction per call, regardless of the number of attendees.
+    """
+
+    @classmethod
+    def settle_event(cls, event_id: int, user_ids: list[int]) -> int:
+        """
+        Credits the points of the event's competencies to every attendee.
+
+        Parameters:
+        - event_id (int): The ID of the attended event.
+        - user_ids (list[int]): The IDs of the users who attended the event.
+
+        Returns:
+        - int: The number of attendees credited by this call.
+
+        Raises:
+        - ValueError: If the event or one of the users does not exist.
+        - sqlite3.DatabaseError: If there is an error with the database.
+        """
+
+        def job(cursor: sqlite3.Cursor) -> int:
+            cursor.execute("SELECT 1 FROM events WHERE id = ?", (event_id,))
+            if cursor.fetchone() is None:
+                raise ValueError(f"unknown event_id {event_id}")
+            cursor.execute("SELECT DISTINCT value FROM json_each(?) WHERE value NOT IN (SELECT id FROM users)",
+                           (json.dumps(user_ids),))
+            unknown = [user_id for user_id, in cursor.fetchall()]
+            if unknown:
+                raise ValueError(f"unknown user ids {unknown}")
+            cls.__prepare_queue(cursor)
+            cursor.executemany("INSERT OR IGNORE INTO temp.settlement_queue (event_id, user_id) VALUES (?,?)",
+                               [(event_id, user_id) for user_id in user_ids])
+            return cls.__settle_queue(cursor)
+
+        return dbwriter.execute(job)
+
+    @classmethod
+    def settle_backlog(cls, batch_size: int = 50) -> int:
+        """
+        Settles all past events whose approved participants from to_events_user_requests have not been credited yet.
+        Events are processed in batches, each batch in its own transaction, so the write lock is released
+        between batches.
+
+        Parameters:
+        - batch_size (int): The number of events settled per transaction.
+
+        Returns:
+        - int: The number of attendees credited.
+
+        Raises:
+        - sqlite3.DatabaseError: If there is an error with the database.
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        def job(cursor: sqlite3.Cursor) -> int | None:
+            cls.__prepare_queue(cursor)
+            cursor.execute(
+                "INSERT OR IGNORE INTO temp.settlement_queue (event_id, user_id) "
+                "SELECT r.event_id, r.user_id FROM to_events_user_requests r "
+                "WHERE r.status = 'approved' AND r.event_id IN ("
+                "SELECT DISTINCT p.event_id FROM to_events_user_requests p JOIN events e ON e.id = p.event_id "
+                "WHERE p.status = 'approved' AND e.date <= ? AND NOT EXISTS (SELECT 1 FROM events_settlements s "
+                "WHERE s.event_id = p.event_id AND s.user_id = p.user_id) LIMIT ?)",
+                (now, batch_size))
+            if cursor.rowcount == 0:
+                return None
+            return cls.__settle_queue(cursor)
+
+        credited = 0
+        while (batch_credited := dbwriter.execute(job)) is not None:
+            credited += batch_credited
+        return credited
+
+    @classmethod
+    def __prepare_queue(cls, cursor: sqlite3.Cursor):
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS settlement_queue (event_id INT NOT NULL, user_id INT NOT NULL, "
+            "PRIMARY KEY (event_id, user_id))")
+        cursor.execute("DELETE FROM temp.settlement_queue")
+
+    @classmethod
+    def __settle_queue(cls, cursor: sqlite3.Cursor) -> int:
+        cursor.execute(
+            "DELETE FROM temp.settlement_queue WHERE EXISTS (SELECT 1 FROM events_settlements s "
+            "WHERE s.event_id = settlement_queue.event_id AND s.user_id = settlement_queue.user_id)")
+        cursor.execute(
+            "INSERT INTO user_competencies (user_id, competencies_id, points) "
+            "SELECT q.user_id, ec.competence_id, SUM(COALESCE(ec.amount_points, 0)) FROM temp.settlement_queue q "
+            "JOIN events_competenece ec ON ec.event_id = q.event_id WHERE true "
+            "GROUP BY q.user_id, ec.competence_id "
+            "ON CONFLICT (user_id, competencies_id) DO UPDATE SET "
+            "points = COALESCE(user_competencies.points, 0) + excluded.points")
+        cursor.execute(
+            "UPDATE users SET version = version + 1, updated_at = CURRENT_TIMESTAMP "
+            "WHERE id IN (SELECT user_id FROM temp.settlement_queue)")
+        cursor.execute(
+            "INSERT INTO events_settlements (event_id, user_id) SELECT event_id, user_id FROM temp.settlement_queue")
+        credited = cursor.rowcount
+        cursor.execute("DELETE FROM temp.settlement_queue")
+        return credited
+
+
+class TestResultsManager:
+    """
+    Bulk ingestion of test results.
+
+    Results are read from an NDJSON or CSV stream with the fields user_id, test_type_id, competence_id,
+    competence_points and an optional timestamp ("%Y-%m-%d %H:%M:%S"). Valid rows are inserted in batches,
+    one writer transaction per batch, and the points are added to user_competencies. Invalid rows are reported
+    with their line number and do not abort the load.
+    """
+    fields = ("user_id", "test_type_id", "competence_id", "competence_points")
+    max_reported_errors = 1000
+
+    @classmethod
+    def load_stream(cls, stream: IO[str], fmt: str, batch_size: int = 1000) -> dict:
+        """
+        Loads test results from a text stream.
+
+        Parameters:
+        - stream (IO[str]): The NDJSON or CSV text stream.
+        - fmt (str): "ndjson" or "csv".
+        - batch_size (int): The number of rows inserted per transaction.
+
+        Returns:
+        - dict: The number of inserted rows, the number of rejected rows and the first rejected rows with reasons.
+
+        Raises:
+        - ValueError: If the format is not supported.
+        - sqlite3.DatabaseError: If there is an error with the database.
+        """
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM test_type")
+            test_types = {row[0] for row in cursor.fetchall()}
+            cursor.execute("SELECT id FROM competencies")
+            competencies = {row[0] for row in cursor.fetchall()}
+
+        report = {"inserted": 0, "rejected": 0, "errors": []}
+        batch = []
+        for line, row, error in cls.__parse(stream, fmt):
+            if error is None:
+                try:
+                    row = cls.__validate(row, test_types, competencies)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                cls.__reject(report, line, error)
+                continue
+            batch.append((line, row))
+            if len(batch) >= batch_size:
+                cls.__flush(batch, report)
+                batch = []
+        if batch:
+            cls.__flush(batch, report)
+        report["errors"].sort(key=lambda error: error["line"])
+        return report
+
+    @classmethod
+    def __parse(cls, stream: IO[str], fmt: str) -> Iterator[tuple[int, dict | None, str | None]]:
+        if fmt == "ndjson":
+            for line, text in enumerate(stream, 1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except json.JSONDecodeError as e:
+                    yield line, None, f"invalid json: {e.msg}"
+                    continue
+                if not isinstance(row, dict):
+                    yield line, None, "row must be a json object"
+                    continue
+                yield line, row, None
+        elif fmt == "csv":
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, row, None
+        else:
+            raise ValueError(f"unsupported format {fmt}")
+
+    @classmethod
+    def __validate(cls, row: dict, test_types: set, competencies: set) -> tuple:
+        values = []
+        for field in cls.fields:
+            value = row.get(field)
+            if value is None or value == "":
+                raise ValueError(f"{field} is required")
+            try:
+                values.append(int(value))
+            except (TypeError, ValueError):
+                raise ValueError(f"{field} must be an integer")
+        user_id, test_type_id, competence_id, competence_points = values
+        if test_type_id not in test_types:
+            raise ValueError(f"unknown test_type_id {test_type_id}")
+        if competence_id not in competencies:
+            raise ValueError(f"unknown competence_id {competence_id}")
+
+        timestamp = row.get("timestamp") or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            raise ValueError("timestamp must be in format YYYY-MM-DD HH:MM:SS")
+        return user_id, test_type_id, competence_id, competence_points, timestamp
+
+    @classmethod
+    def __reject(cls, report: dict, line: int, message: str):
+        report["rejected"] += 1
+        if len(report["errors"]) < cls.max_reported_errors:
+            report["errors"].append({"line": line, "message": message})
+
+    @classmethod
+    def __flush(cls, batch: list, report: dict):
+        user_ids = list({row[0] for _, row in batch})
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id FROM users WHERE id IN ({','.join('?' * len(user_ids))})", user_ids)
+            known_users = {row[0] for row in cursor.fetchall()}
+
+        rows = []
+        points: dict[tuple[int, int], int] = {}
+        for line, row in batch:
+            if row[0] not in known_users:
+                cls.__reject(report, line, f"unknown user_id {row[0]}")
+                continue
+            rows.append(row)
+            key = (row[0], row[2])
+            points[key] = points.get(key, 0) + row[3]
+
+        def job(cursor: sqlite3.Cursor) -> int:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM user_tests_results")
+            first_result_id = cursor.fetchone()[0] + 1
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM user_tests_history")
+            first_history_id = cursor.fetchone()[0] + 1
+            cursor.executemany(
+                "INSERT INTO user_tests_results (id, user_id, test_type_id, competence_id, competence_points) "
+                "VALUES (?,?,?,?,?)",
+                [(first_result_id + i, user_id, test_type_id, competence_id, competence_points)
+                 for i, (user_id, test_type_id, competence_id, competence_points, _) in enumerate(rows)])
+            cursor.executemany(
+                "INSERT INTO user_tests_history (id, timestamp, user_tests_results_id) VALUES (?,?,?)",
+                [(first_history_id + i, row[4], first_result_id + i) for i, row in enumerate(rows)])
+            cursor.executemany(
+                "INSERT INTO user_competencies (user_id, competencies_id, points) VALUES (?,?,?) "
+                "ON CONFLICT (user_id, competencies_id) DO UPDATE SET "
+                "points = COALESCE(user_competencies.points, 0) + excluded.points",
+                [(user_id, competence_id, amount) for (user_id, competence_id), amount in points.items()])
+            dbmanager.bump_user_versions(cursor, list({user_id for user_id, _ in points}))
+            return len(rows)
+
+        if rows:
+            report["inserted"] += dbwriter.execute(job)
 
 
 class RolesManager:
@@ -256,12 +995,16 @@ class RolesManager:
         roles (dict): A dictionary containing role IDs as keys and their corresponding names as values.
     """
 
+    __cache: dict | None = None
+
     def __init__(self):
-        self.roles = self.__load_roles_from_bd()
+        if RolesManager.__cache is None:
+            RolesManager.__cache = self.__load_roles_from_bd()
+        self.roles = RolesManager.__cache
 
     def __load_roles_from_bd(self) -> dict:
         roles: dict = {}
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM roles")
             result = cursor.fetchall()
@@ -270,7 +1013,7 @@ class RolesManager:
             return roles
 
     def validate_role(self, role_name: str) -> bool:
-        return role_name in self.roles
+        return role_name in self.roles.values()
 
     def get_role_by_id(self, id: int) -> str:
         return self.roles[id]
@@ -283,14 +1026,18 @@ class Competence:
 
 
 class CompetenciesManager:
+    __cache: dict | None = None
+
     def __init__(self):
-        self.competencies = self.__load_competencies_from_bd()
+        if CompetenciesManager.__cache is None:
+            CompetenciesManager.__cache = self.__load_competencies_from_bd()
+        self.competencies = CompetenciesManager.__cache
 
     def get_name_by_id(self, id: int) -> str:
         return self.competencies[id]
 
     def __load_competencies_from_bd(self) -> dict:
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM competencies")
             competencies = {}
@@ -300,9 +1047,275 @@ class CompetenciesManager:
             return competencies
 
 
+class CompetenceLevelResolver:
+    """
+    Resolves competence points into levels.
+
+    Thresholds from competenices_levels are loaded once into sorted arrays per competence,
+    a level is then found with a binary search over the thresholds of its competence.
+    """
+    __thresholds: dict[int, list[int]] | None = None
+    __levels: dict[int, list[int]] = {}
+    __indicators: dict[int, list[list[int]]] = {}
+
+    @classmethod
+    def reload(cls):
+        """
+        Loads level thresholds and level indicators from the database, replacing the cached ones.
+        """
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT competenices_levels_id, indicator_id FROM levels_indicators")
+            level_indicators: dict[int, list[int]] = {}
+            for level_row_id, indicator_id in cursor.fetchall():
+                level_indicators.setdefault(level_row_id, []).append(indicator_id)
+
+            cursor.execute(
+                "SELECT id, competence_id, competence_level_id, exp_amount FROM competenices_levels "
+                "WHERE exp_amount IS NOT NULL ORDER BY competence_id, exp_amount")
+            thresholds, levels, indicators = {}, {}, {}
+            for level_row_id, competence_id, level_id, exp_amount in cursor.fetchall():
+                thresholds.setdefault(competence_id, []).append(exp_amount)
+                levels.setdefault(competence_id, []).append(level_id)
+                indicators.setdefault(competence_id, []).append(level_indicators.get(level_row_id, []))
+        cls.__levels, cls.__indicators = levels, indicators
+        cls.__thresholds = thresholds
+
+    @classmethod
+    def resolve(cls, competence_id: int, points: int | None) -> dict:
+        """
+        Returns the level reached with the given points and the progress towards the next level.
+
+        Returns:
+        - dict: competence_id, points, level (0 if no level is reached), indicators of the reached level,
+          next_level_points (None on the last level) and progress (0..1, 1 on the last level).
+        """
+        if cls.__thresholds is None:
+            cls.reload()
+        points = points or 0
+        thresholds = cls.__thresholds.get(competence_id, [])
+        reached = bisect.bisect_right(thresholds, points)
+
+        level, indicators, previous = 0, [], 0
+        if reached > 0:
+            level = cls.__levels[competence_id][reached - 1]
+            indicators = cls.__indicators[competence_id][reached - 1]
+            previous = thresholds[reached - 1]
+        next_level_points, progress = None, 1.0
+        if reached < len(thresholds):
+            next_level_points = thresholds[reached]
+            progress = round((points - previous) / (next_level_points - previous), 4) \
+                if next_level_points > previous else 1.0
+        return {"competence_id": competence_id, "points": points, "level": level, "indicators": indicators,
+                "next_level_points": next_level_points, "progress": progress}
+
+    @classmethod
+    def resolve_all(cls, competencies: list) -> list[dict]:
+        """
+        Resolves a list of (competence_id, points) pairs as stored in CampusAccount.competencies.
+        """
+        return [cls.resolve(competence_id, points) for competence_id, points in competencies]
+
+
+class LeaderboardsManager:
+    """
+    Serves leaderboards of students, overall (sum of all competence points) and per competence,
+    globally and per university.
+
+    Every leaderboard is kept in memory as a list of (-points, user_id) sorted ascending, so a page is a slice and
+    a position is a binary search. Triggers append every user whose points, university or role changed to
+    leaderboard_changes; before answering, only the users changed since the last seen sequence number are reloaded
+    and moved within their leaderboards, including changes written by other processes (e.g. settle-backlog).
+    With partitioning enabled, every partition has its own leaderboards.
+    """
+    # Above this number of changed users the leaderboards are rebuilt from scratch instead.
+    full_reload_threshold = 5000
+    __lock = threading.Lock()
+    __seq: int | None = None
+    __rankings: dict[tuple[int | None, int | None], list[tuple[int, int]]] = {}
+    __entries: dict[int, tuple[int | None, dict[int, int]]] = {}
+    __db_path: str | None = None
+    __other_databases: dict[str, tuple] = {}
+
+    @classmethod
+    def __keys(cls, user_id: int, entry: tuple[int | None, dict[int, int]]) -> Iterator[tuple[tuple, tuple]]:
+        university_id, points = entry
+        scopes = [(competence_id, -competence_points) for competence_id, competence_points in points.items()]
+        scopes.append((None, -sum(points.values())))
+        for competence_id, negated_points in scopes:
+            yield (competence_id, None), (negated_points, user_id)
+            if university_id is not None:
+                yield (competence_id, university_id), (negated_points, user_id)
+
+    @classmethod
+    def __remove(cls, user_id: int):
+        entry = cls.__entries.pop(user_id, None)
+        if entry is None:
+            return
+        for scope, key in cls.__keys(user_id, entry):
+            ranking = cls.__rankings[scope]
+            index = bisect.bisect_left(ranking, key)
+            if index < len(ranking) and ranking[index] == key:
+                del ranking[index]
+
+    @classmethod
+    def __add(cls, user_id: int, entry: tuple[int | None, dict[int, int]]):
+        cls.__entries[user_id] = entry
+        for scope, key in cls.__keys(user_id, entry):
+            bisect.insort(cls.__rankings.setdefault(scope, []), key)
+
+    @classmethod
+    def __load_entries(cls, cursor: sqlite3.Cursor, user_ids: list[int] = None) -> dict:
+        sql = ("SELECT u.id, u.univercities_id, uc.competencies_id, uc.points FROM users u "
+               "JOIN user_competencies uc ON uc.user_id = u.id WHERE u.role_id = 1")
+        params = ()
+        if user_ids is not None:
+            sql += " AND u.id IN (SELECT value FROM json_each(?))"
+            params = (json.dumps(user_ids),)
+        cursor.execute(sql, params)
+        entries: dict[int, tuple[int | None, dict[int, int]]] = {}
+        for user_id, university_id, competence_id, points in cursor.fetchall():
+            entries.setdefault(user_id, (university_id, {}))[1][competence_id] = points or 0
+        return entries
+
+    @classmethod
+    def __use(cls, db_path: str):
+        """
+        Makes the leaderboards of a database the current ones, the lock must be held.
+        """
+        if db_path != cls.__db_path:
+            if cls.__db_path is not None:
+                cls.__other_databases[cls.__db_path] = (cls.__seq, cls.__rankings, cls.__entries)
+            cls.__seq, cls.__rankings, cls.__entries = cls.__other_databases.pop(db_path, (None, {}, {}))
+            cls.__db_path = db_path
+
+    @classmethod
+    def __refresh(cls, db_path: str):
+        """
+        Brings the leaderboards of a database up to date. The database is read without holding the lock, the result
+        is applied under it unless another thread refreshed the leaderboards meanwhile, then the reads are repeated.
+        """
+        while True:
+            with cls.__lock:
+                cls.__use(db_path)
+                seq = cls.__seq
+            changes = None
+            with dbmanager.read_connection() as conn:
+                cursor = conn.cursor()
+                if seq is not None:
+                    cursor.execute(
+                        "SELECT seq, user_id, (SELECT MIN(seq) FROM leaderboard_changes) FROM leaderboard_changes "
+                        "WHERE seq > ? ORDER BY seq", (seq,))
+                    changes = cursor.fetchall()
+                    if not changes:
+                        return
+                    user_ids = list({user_id for _, user_id, _ in changes})
+                    # Changes older than the oldest kept one were pruned before they were seen.
+                    if changes[0][2] > seq + 1 or len(user_ids) > cls.full_reload_threshold:
+                        changes = None
+                if changes is not None:
+                    entries = cls.__load_entries(cursor, user_ids)
+                else:
+                    cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM leaderboard_changes")
+                    new_seq = cursor.fetchone()[0]
+                    entries = cls.__load_entries(cursor)
+            rankings: dict[tuple[int | None, int | None], list[tuple[int, int]]] = {}
+            if changes is None:
+                for user_id, entry in entries.items():
+                    for scope, key in cls.__keys(user_id, entry):
+                        rankings.setdefault(scope, []).append(key)
+                for ranking in rankings.values():
+                    ranking.sort()
+
+            with cls.__lock:
+                cls.__use(db_path)
+                if cls.__seq != seq:
+                    continue
+                if changes is not None:
+                    for user_id in user_ids:
+                        cls.__remove(user_id)
+                        if user_id in entries:
+                            cls.__add(user_id, entries[user_id])
+                    cls.__seq = changes[-1][0]
+                else:
+                    cls.__rankings, cls.__entries, cls.__seq = rankings, entries, new_seq
+                return
+
+    @classmethod
+    def refresh(cls):
+        """
+        Builds the leaderboards on first use, afterwards applies the changes logged since the last refresh.
+        """
+        cls.__refresh(partitions.current_db_path())
+
+    @classmethod
+    def get_leaderboard_as_json(cls, competence_id: int = None, university_id: int = None, limit: int = 20,
+                                offset: int = 0) -> str:
+        """
+        Returns a page of a leaderboard. Students with equal points share a position.
+
+        Parameters:
+        - competence_id (int): If provided, students are ranked by the points of this competence,
+          otherwise by the sum of all their competence points.
+        - university_id (int): If provided, only students of this university are ranked.
+        - limit (int): The maximum number of students in the page.
+        - offset (int): The number of students to skip.
+
+        Returns:
+        - str: A JSON string with the page of students, the number of ranked students and the pagination parameters.
+
+        Raises:
+        - sqlite3.DatabaseError: If there is an error with the database.
+        """
+        db_path = partitions.current_db_path()
+        cls.__refresh(db_path)
+        with cls.__lock:
+            cls.__use(db_path)
+            ranking = cls.__rankings.get((competence_id, university_id), [])
+            page = [(bisect.bisect_left(ranking, (negated_points,)) + 1, user_id, -negated_points)
+                    for negated_points, user_id in ranking[offset:offset + limit]]
+            total = len(ranking)
+        names = {}
+        if page:
+            with dbmanager.read_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT id, firstname, secondname, univercities_id FROM users "
+                    "WHERE id IN (SELECT value FROM json_each(?))", (json.dumps([user_id for _, user_id, _ in page]),))
+                names = {user_id: row for user_id, *row in cursor.fetchall()}
+        leaders = []
+        for position, user_id, points in page:
+            first_name, second_name, user_university_id = names.get(user_id, (None, None, None))
+            leaders.append({"position": position, "user_id": user_id, "first_name": first_name,
+                            "second_name": second_name, "university_id": user_university_id, "points": points})
+        return json.dumps({"leaders": leaders, "total": total, "limit": limit, "offset": offset})
+
+    @classmethod
+    def get_position_as_json(cls, user_id: int, competence_id: int = None, university_id: int = None) -> str:
+        """
+        Returns the position of a student in a leaderboard, found with a binary search.
+
+        Returns:
+        - str: A JSON string with position and points (both None if the student is not ranked)
+          and the number of ranked students.
+        """
+        db_path = partitions.current_db_path()
+        cls.__refresh(db_path)
+        with cls.__lock:
+            cls.__use(db_path)
+            ranking = cls.__rankings.get((competence_id, university_id), [])
+            entry = cls.__entries.get(user_id)
+            position, points = None, None
+            if entry is not None and (university_id is None or entry[0] == university_id) and \
+                    (competence_id is None or competence_id in entry[1]):
+                points = entry[1][competence_id] if competence_id is not None else sum(entry[1].values())
+                position = bisect.bisect_left(ranking, (-points,)) + 1
+            return json.dumps({"position": position, "points": points, "total": len(ranking)})
+
+
 class CampusAccount:
     def __init__(self, user_id: int, first_name: str, second_name: str, third_name: str, email: str, university_id: int,
-                 role_id: int):
+                 role_id: int, competencies: list = None, version: int = None):
         self.comp_manager = CompetenciesManager()
         self.user_id = user_id
         self.first_name = first_name
@@ -311,28 +1324,49 @@ class CampusAccount:
         self.email = email
         self.university_id = university_id
         self.role_id = role_id
-        self.competencies = self.__get_competencies()
+        self.version = version
+        self.competencies = competencies if competencies is not None else self.__get_competencies()
+
+    def get_suggested_event_ids(self) -> list[int]:
+        """
+            Returns the IDs of verified events that share at least one indicator with the user.
+        """
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT e.id FROM events e WHERE e.verified = 1 AND EXISTS ("
+                "SELECT 1 FROM events_indicators ei JOIN user_indicators ui ON ui.indicator_id = ei.indicator_id "
+                "WHERE ei.event_id = e.id AND ui.user_id = ?) ORDER BY e.id",
+                (self.user_id,))
+            return [event_id for event_id, in cursor.fetchall()]
 
     def get_suggested_events(self) -> list[Event]:
         """
             Returns a list of suggested events for the user.
         """
-        events = []
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        event_ids = self.get_suggested_event_ids()
+        if not event_ids:
+            return []
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT id FROM events WHERE verified = 1", (self.user_id,))
-            list_of_verified_events_id = cursor.fetchall()
-            indicators = self.get_indicators()
-
-            for event_id in list_of_verified_events_id:
-                event_id = event_id[0]
-                for indicator in indicators:
-                    cursor.execute("SELECT * FROM events_indicators WHERE event_id = ? AND indicator_id = ?",
-                                   (event_id, indicator.indicator_id,))
-                    result = cursor.fetchone()
-                    if result is not None:
-                        events.append(Event.get_by_id(event_id))
-        return events
+            cursor.execute(
+                "SELECT ei.event_id, i.name, i.id, i.type FROM events_indicators ei "
+                "JOIN indicators i ON i.id = ei.indicator_id WHERE ei.event_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(event_ids),))
+            indicators: dict[int, list[Indicator]] = {}
+            for event_id, ind_name, indicator_id, ind_type in cursor.fetchall():
+                indicators.setdefault(event_id, []).append(Indicator(ind_name, indicator_id, bool(ind_type)))
+            cursor.execute(
+                "SELECT e.id, e.organizer_id, e.verified, e.date, e.address, e.name, e.description, "
+                f"{EventReviewsManager.stats_columns} FROM events e "
+                "LEFT JOIN event_rating_stats s ON s.event_id = e.id "
+                "WHERE e.id IN (SELECT value FROM json_each(?)) ORDER BY e.id",
+                (json.dumps(event_ids),))
+            return [Event(name, event_id, organizer_id, verified, datetime.strptime(date, "%Y-%m-%d %H:%M:%S"),
+                          address, description, indicators.get(event_id, []),
+                          EventReviewsManager.rating_from_stats(stats))
+                    for event_id, organizer_id, verified, date, address, name, description, *stats in
+                    cursor.fetchall()]
 
     def account_info_json_self(self) -> str:
         """
@@ -346,12 +1380,19 @@ class CampusAccount:
             "email": self.email,
             "university_id": self.university_id,
             "role_id": self.role_id,
-            "competencies": self.competencies
+            "competencies": self.competencies,
+            "competence_levels": CompetenceLevelResolver.resolve_all(self.competencies)
         })
 
     def get_info_json_as(self, as_role: str) -> str:
+        return json.dumps(self.get_info_as(as_role))
+
+    def get_info_as(self, as_role: str) -> dict | None:
+        """
+            Returns the user's account information visible to the given role.
+        """
         if as_role == "Асессор":
-            return json.dumps({
+            return {
                 "user_id": self.user_id,
                 "first_name": self.first_name,
                 "second_name": self.second_name,
@@ -359,10 +1400,11 @@ class CampusAccount:
                 "email": self.email,
                 "university_id": self.university_id,
                 "role_id": self.role_id,
-                "competencies": self.competencies
-            })
+                "competencies": self.competencies,
+                "competence_levels": CompetenceLevelResolver.resolve_all(self.competencies)
+            }
         if as_role == "Студент":
-            return json.dumps({
+            return {
                 "user_id": self.user_id,
                 "first_name": self.first_name,
                 "second_name": self.second_name,
@@ -370,9 +1412,9 @@ class CampusAccount:
                 "email": self.email,
                 "university_id": self.university_id,
                 "role_id": self.role_id
-            })
+            }
         if as_role == "Организатор":
-            return json.dumps({
+            return {
                 "user_id": self.user_id,
                 "first_name": self.first_name,
                 "second_name": self.second_name,
@@ -380,73 +1422,92 @@ class CampusAccount:
                 "email": self.email,
                 "university_id": self.university_id,
                 "role_id": self.role_id,
-                "competencies": self.competencies
-            })
+                "competencies": self.competencies,
+                "competence_levels": CompetenceLevelResolver.resolve_all(self.competencies)
+            }
 
     def get_role_name(self) -> str:
         return RolesManager().get_role_by_id(self.role_id)
 
-    def __reset_preferences_competence(self):
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM user_preferences_competencies WHERE user_id = ?", (self.user_id,))
-            conn.commit()
+    def __reset_preferences_competence(self, cursor: sqlite3.Cursor):
+        cursor.execute("DELETE FROM user_preferences_competencies WHERE user_id = ?", (self.user_id,))
 
-    def __reset_indicators(self):
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM user_indicators WHERE user_id = ?", (self.user_id,))
-            conn.commit()
+    def __reset_indicators(self, cursor: sqlite3.Cursor):
+        cursor.execute("DELETE FROM user_indicators WHERE user_id = ?", (self.user_id,))
 
     def set_indicators(self, indicators: list[Indicator]):
-        self.__reset_indicators()
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
-            cursor = conn.cursor()
-            for ind in indicators:
-                cursor.execute(
-                    "INSERT INTO user_indicators (indicator_id, user_id) VALUES (?,?)",
-                    (ind.indicator_id, self.user_id,)
-                )
-            conn.commit()
+        def job(cursor: sqlite3.Cursor):
+            self.__reset_indicators(cursor)
+            cursor.executemany(
+                "INSERT INTO user_indicators (indicator_id, user_id) VALUES (?,?)",
+                [(ind.indicator_id, self.user_id,) for ind in indicators]
+            )
+            dbmanager.bump_user_versions(cursor, [self.user_id])
+
+        dbwriter.execute(job)
 
     def get_indicators(self) -> list[Indicator]:
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT indicator_id FROM user_indicators WHERE user_id = ?",
+                "SELECT i.name, i.id, i.type FROM user_indicators ui JOIN indicators i ON i.id = ui.indicator_id "
+                "WHERE ui.user_id = ?",
                 (self.user_id,))
-            result = cursor.fetchall()
-            indicators = []
-            for ind in result:
-                indicators.append(Indicator.get_by_id(ind[0]))
-            return indicators
+            return [Indicator(ind_name, indicator_id, bool(ind_type))
+                    for ind_name, indicator_id, ind_type in cursor.fetchall()]
 
     def set_preference_competencies(self, comp_list: list[Competence]):
-        self.__reset_preferences_competence()
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
-            cursor = conn.cursor()
-            for comp in comp_list:
-                cursor.execute(
-                    "INSERT INTO user_preferences_competencies (competence_id, user_id) VALUES (?,?)",
-                    (comp.comp_id, self.user_id,)
-                )
-            conn.commit()
+        def job(cursor: sqlite3.Cursor):
+            self.__reset_preferences_competence(cursor)
+            cursor.executemany(
+                "INSERT INTO user_preferences_competencies (competence_id, user_id) VALUES (?,?)",
+                [(comp.comp_id, self.user_id,) for comp in comp_list]
+            )
+
+        dbwriter.execute(job)
 
     @classmethod
     def get_by_id(cls, user_id: int) -> Union["CampusAccount", None]:
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT firstname, secondname, thirdname, email, univercities_id, role_id FROM users WHERE id = ?",
+                "SELECT firstname, secondname, thirdname, email, univercities_id, role_id, version FROM users "
+                "WHERE id = ?",
                 (user_id,))
             result = cursor.fetchone()
             if result is not None:
-                first_name, second_name, third_name, email, university_id, role_id = result
-                return CampusAccount(user_id, first_name, second_name, third_name, email, university_id, role_id)
+                first_name, second_name, third_name, email, university_id, role_id, version = result
+                return CampusAccount(user_id, first_name, second_name, third_name, email, university_id, role_id,
+                                     version=version)
             return None
 
+    @classmethod
+    def get_many_by_ids(cls, user_ids: list[int]) -> list["CampusAccount"]:
+        """
+        Returns the accounts with the given IDs, loading users and their competencies with one query each.
+        Unknown IDs are skipped.
+        """
+        if not user_ids:
+            return []
+        placeholders = ",".join("?" * len(user_ids))
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT user_id, points, competencies_id FROM user_competencies "
+                f"WHERE user_id IN ({placeholders})", user_ids)
+            competencies: dict[int, list] = {}
+            for user_id, points, competence_id in cursor.fetchall():
+                competencies.setdefault(user_id, []).append((competence_id, points,))
+            cursor.execute(
+                "SELECT id, firstname, secondname, thirdname, email, univercities_id, role_id FROM users "
+                f"WHERE id IN ({placeholders})", user_ids)
+            return [CampusAccount(user_id, first_name, second_name, third_name, email, university_id, role_id,
+                                  competencies.get(user_id, []))
+                    for user_id, first_name, second_name, third_name, email, university_id, role_id in
+                    cursor.fetchall()]
+
     def __get_competencies(self) -> list:
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "SELECT points, competencies_id FROM user_competencies WHERE user_id = ?",
@@ -459,9 +1520,7 @@ class CampusAccount:
 
     def edit(self, first_name: str = None, second_name: str = None, third_name: str = None, email: str = None,
              university: int = -999):
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
-            cursor = conn.cursor()
-
+        def job(cursor: sqlite3.Cursor):
             if first_name is not None:
                 cursor.execute(
                     "UPDATE users SET firstname = ? WHERE id = ?", (first_name, self.user_id,))
@@ -477,11 +1536,22 @@ class CampusAccount:
             if university != -999 and university <= 5:
                 cursor.execute(
                     "UPDATE users SET univercities_id = ? WHERE id = ?", (university, self.user_id,))
-            conn.commit()
+            dbmanager.bump_user_versions(cursor, [self.user_id])
+
+        # Logins are routed by the email in the partition directory, so it is changed there first.
+        move_email = partitions.enabled() and email is not None and email != self.email
+        if move_email:
+            dbmanager.set_partition_user_email(self.user_id, email)
+        try:
+            dbwriter.execute(job)
+        except Exception:
+            if move_email:
+                dbmanager.set_partition_user_email(self.user_id, self.email)
+            raise
 
     @classmethod
     def get_from_api_key(cls, api_key: str) -> Union["CampusAccount", None]:
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             user_id = dbmanager.get_user_id_from_api_key(api_key)
             if user_id is not None:
@@ -501,7 +1571,7 @@ class CampusAccount:
         Returns a CampusAccount object for the given login and password.
         """
         password_hashed = utils.CryptUtils.get_hash_512(password_raw)
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "SELECT id FROM users WHERE email = ? AND password = ?", (email, password_hashed))
@@ -513,18 +1583,18 @@ class CampusAccount:
                 return None
 
     def create_new_api_key(self, useragent: str, ip: str) -> str:
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
-            cursor = conn.cursor()
-            api_key_raw = utils.generate_api_key()
-            api_key_hashed = utils.CryptUtils.get_hash_512(api_key_raw)
+        api_key_raw = utils.generate_api_key()
+        api_key_hashed = utils.CryptUtils.get_hash_512(api_key_raw)
 
-            cursor.execute(
-                "INSERT INTO user_api_keys (api_key, user_id, ip_address, last_useragent, last_access) VALUES (?,?,?,?,CURRENT_TIMESTAMP)",
-                (str(api_key_hashed), int(self.user_id), str(ip), str(useragent)))
-            return api_key_raw
+        if partitions.enabled():
+            dbmanager.register_partition_api_key(api_key_hashed, self.university_id)
+        dbwriter.execute(lambda cursor: cursor.execute(
+            "INSERT INTO user_api_keys (api_key, user_id, ip_address, last_useragent, last_access) VALUES (?,?,?,?,CURRENT_TIMESTAMP)",
+            (str(api_key_hashed), int(self.user_id), str(ip), str(useragent))))
+        return api_key_raw
 
     def get_sessions(self) -> dict:
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
+        with dbmanager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "SELECT id, ip_address, last_useragent, last_access, created_at FROM user_api_keys WHERE user_id = ?",
@@ -536,34 +1606,39 @@ class CampusAccount:
     @classmethod
     def register(cls, first_name: str, last_name: str, third_name: str, email: str, password_raw: str,
                  university: int, ip_addr: str, user_agent: str) -> str | utils.OpStatus:
-        with sqlite3.connect(settings.get_main_db_path()) as conn:
-            cursor = conn.cursor()
-            try:
-                if university > 5:
-                    return utils.OpStatus("University index invalid", False)
-
-                password_hashed = utils.CryptUtils.get_hash_512(password_raw)
+        if university not in UniversityManager.get_university_ids():
+            return utils.OpStatus("University index invalid", False)
 
-                cursor.execute(
-                    "INSERT INTO users (firstname, secondname, thirdname, email, password, univercities_id, role_id) VALUES (?,?,?,?,?,?,?)",
-                    (first_name, last_name, third_name, email, password_hashed, university, 1))
-
-                conn.commit()
-                cursor.execute("SELECT id FROM users WHERE email = ?", (email,))
-                user_id = cursor.fetchone()[0]
-
-                api_key_raw = utils.generate_api_key()
-                api_key_hashed = utils.CryptUtils.get_hash_512(api_key_raw)
+        password_hashed = utils.CryptUtils.get_hash_512(password_raw)
+        api_key_raw = utils.generate_api_key()
+        api_key_hashed = utils.CryptUtils.get_hash_512(api_key_raw)
 
-                cursor.execute(
-                    "INSERT INTO user_api_keys (api_key, user_id, ip_address, last_useragent, last_access) VALUES (?,?,?,?,CURRENT_TIMESTAMP)",
-                    (str(api_key_hashed), int(user_id), str(ip_addr), str(user_agent)))
+        def job(cursor: sqlite3.Cursor):
+            cursor.execute(
+                "INSERT INTO users (id, firstname, secondname, thirdname, email, password, univercities_id, role_id) VALUES (?,?,?,?,?,?,?,?)",
+                (partition_user_id, first_name, last_name, third_name, email, password_hashed, university, 1))
+            user_id = cursor.lastrowid
 
-                conn.commit()
+            cursor.execute(
+                "INSERT INTO user_api_keys (api_key, user_id, ip_address, last_useragent, last_access) VALUES (?,?,?,?,CURRENT_TIMESTAMP)",
+                (str(api_key_hashed), int(user_id), str(ip_addr), str(user_agent)))
 
-                return api_key_raw
-            except sqlite3.DatabaseError as e:
-                return utils.OpStatus(f"Error with db {e.sqlite_errorname}", False)
+        try:
+            partition_user_id = None
+            if partitions.enabled():
+                # IDs are allocated in the common database, so they stay unique across partitions.
+                partition_user_id = dbmanager.register_partition_user(email, university)
+            try:
+                if partition_user_id is not None:
+                    dbmanager.register_partition_api_key(api_key_hashed, university)
+                dbwriter.execute(job)
+            except sqlite3.DatabaseError:
+                if partition_user_id is not None:
+                    dbmanager.unregister_partition_user(partition_user_id, api_key_hashed)
+                raise
+            return api_key_raw
+        except sqlite3.DatabaseError as e:
+            return utils.OpStatus(f"Error with db {e.sqlite_errorname}", False)
 
     @classmethod
     def login(cls, email: str, password_raw: str, ip_address: str, user_agent: str) -> str | utils.OpStatus:
@@ -1,22 +1,408 @@
+import json
 import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable
 
-import settings
+import dbwriter
+import partitions
 import utils
 
+_local = threading.local()
+# last_access of an API key is refreshed at most once per interval, so authentication rarely writes.
+api_key_touch_interval = "-1 day"
+_statement_tracer: Callable[[str], None] | None = None
+
+
+class _SharedConnection:
+    """
+    A read connection shared by all reads inside read_snapshot(). Leaving a `with` block does not end
+    its read transaction.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.__conn = conn
+
+    def __getattr__(self, name: str):
+        return getattr(self.__conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class _TracingConnection(sqlite3.Connection):
+    """
+    A read connection that reports every statement executed through it to its tracer, once per execute call.
+    """
+    tracer: Callable[[str], None] | None = None
+
+    def cursor(self, factory=dbwriter.TracingCursor):
+        cursor = super().cursor(factory)
+        cursor.tracer = self.tracer
+        return cursor
+
+    def execute(self, sql: str, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def set_statement_tracer(callback: Callable[[str], None] | None):
+    """
+    Makes every statement executed on the main database, by readers and by the writer, call the callback
+    with its SQL, once per execute call. Used to count queries, None switches tracing off.
+    """
+    global _statement_tracer
+    _statement_tracer = callback
+    dbwriter.get_writer().set_trace_callback(callback)
+
+
+def _connect_read_only(**kwargs) -> sqlite3.Connection:
+    db_path = partitions.current_db_path()
+    tracer = _statement_tracer
+    if tracer is not None:
+        kwargs["factory"] = _TracingConnection
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30, **kwargs)
+    for name, path in partitions.attached_databases(db_path).items():
+        conn.execute(f"ATTACH DATABASE ? AS {name}", (f"file:{path}?mode=ro",))
+    if tracer is not None:
+        conn.tracer = tracer
+    return conn
+
+
+def read_connection() -> sqlite3.Connection:
+    """
+    Opens a read-only connection to the current database (see partitions.current_db_path()).
+    All writes go through dbwriter.
+    Inside read_snapshot() the shared connection of the current thread is returned instead.
+    """
+    shared = getattr(_local, "shared", None)
+    if shared is not None:
+        return shared
+    return _connect_read_only()
+
+
+@contextmanager
+def read_snapshot():
+    """
+    Makes every read_connection() call of the current thread inside the block use one connection and one
+    read transaction, so the reads share a single connection and see the same snapshot of the database.
+    """
+    if getattr(_local, "shared", None) is not None:
+        yield
+        return
+    conn = _connect_read_only(isolation_level=None)
+    conn.execute("BEGIN")
+    _local.shared = _SharedConnection(conn)
+    try:
+        yield
+    finally:
+        _local.shared = None
+        conn.execute("ROLLBACK")
+        conn.close()
+
+
+def table_exists(cursor: sqlite3.Cursor, name: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+    return cursor.fetchone() is not None
+
+
+def _create_events_search_index(cursor: sqlite3.Cursor):
+    """
+    Creates the FTS5 index over events (name, description, address) and the triggers that keep it in sync.
+    """
+    if table_exists(cursor, "events_fts"):
+        return
+    cursor.execute(
+        "CREATE VIRTUAL TABLE events_fts USING fts5(name, description, address, content='events', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+    cursor.execute(
+        "CREATE TRIGGER events_fts_insert AFTER INSERT ON events BEGIN "
+        "INSERT INTO events_fts (rowid, name, description, address) "
+        "VALUES (new.id, new.name, new.description, new.address); END")
+    cursor.execute(
+        "CREATE TRIGGER events_fts_delete AFTER DELETE ON events BEGIN "
+        "INSERT INTO events_fts (events_fts, rowid, name, description, address) "
+        "VALUES ('delete', old.id, old.name, old.description, old.address); END")
+    cursor.execute(
+        "CREATE TRIGGER events_fts_update AFTER UPDATE OF name, description, address ON events BEGIN "
+        "INSERT INTO events_fts (events_fts, rowid, name, description, address) "
+        "VALUES ('delete', old.id, old.name, old.description, old.address); "
+        "INSERT INTO events_fts (rowid, name, description, address) "
+        "VALUES (new.id, new.name, new.description, new.address); END")
+    cursor.execute("INSERT INTO events_fts (events_fts) VALUES ('rebuild')")
+
+
+def _create_settlement_tables(cursor: sqlite3.Cursor):
+    """
+    Creates the settlement ledger and makes user_competencies hold one row per user and competence,
+    which the set-based upserts rely on.
+    """
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS events_settlements ("
+        "event_id INT NOT NULL, user_id INT NOT NULL, settled_at TEXT DEFAULT CURRENT_TIMESTAMP, "
+        "PRIMARY KEY (event_id, user_id))")
+    if table_exists(cursor, "user_competencies_user_competence"):
+        return
+    # Merge duplicate rows left by older versions before the unique index can be created.
+    cursor.execute(
+        "UPDATE user_competencies SET points = (SELECT SUM(uc.points) FROM user_competencies uc "
+        "WHERE uc.user_id = user_competencies.user_id AND uc.competencies_id = user_competencies.competencies_id) "
+        "WHERE id IN (SELECT MIN(id) FROM user_competencies GROUP BY user_id, competencies_id HAVING COUNT(*) > 1)")
+    cursor.execute(
+        "DELETE FROM user_competencies WHERE id NOT IN "
+        "(SELECT MIN(id) FROM user_competencies GROUP BY user_id, competencies_id)")
+    cursor.execute(
+        "CREATE UNIQUE INDEX user_competencies_user_competence ON user_competencies (user_id, competencies_id)")
+
+
+def column_exists(cursor: sqlite3.Cursor, table: str, column: str) -> bool:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def _add_test_results_owner(cursor: sqlite3.Cursor):
+    """
+    Links test results to the user who passed the test.
+    """
+    if not column_exists(cursor, "user_tests_results", "user_id"):
+        cursor.execute("ALTER TABLE user_tests_results ADD COLUMN user_id INT REFERENCES users(id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS user_tests_results_user ON user_tests_results (user_id)")
+
+
+def _rating_stats_add(row: str, sign: str) -> str:
+    """
+    Returns the statement adding (sign "+") or removing (sign "-") one review of the trigger row
+    ("new" or "old") to or from event_rating_stats.
+    """
+    histogram = ", ".join(f"stars_{stars} = stars_{stars} {sign} ({row}.stars = {stars})" for stars in range(1, 6))
+    return (f"INSERT INTO event_rating_stats (event_id) VALUES ({row}.event_id) ON CONFLICT (event_id) DO NOTHING; "
+            f"UPDATE event_rating_stats SET reviews_count = reviews_count {sign} 1, "
+            f"stars_sum = stars_sum {sign} {row}.stars, {histogram} WHERE event_id = {row}.event_id;")
+
+
+def _create_rating_stats(cursor: sqlite3.Cursor):
+    """
+    Creates event_rating_stats with per-event review count, stars sum and stars histogram,
+    maintained by triggers on reports_about_events, and links reviews to their authors.
+    """
+    if not column_exists(cursor, "reports_about_events", "user_id"):
+        cursor.execute("ALTER TABLE reports_about_events ADD COLUMN user_id INT REFERENCES users(id)")
+        cursor.execute("ALTER TABLE reports_about_events ADD COLUMN created_at TEXT")
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS reports_about_events_event_user ON reports_about_events (event_id, user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS reports_about_events_event_id ON reports_about_events (event_id, id)")
+    if table_exists(cursor, "event_rating_stats"):
+        return
+    cursor.execute(
+        "CREATE TABLE event_rating_stats (event_id INTEGER PRIMARY KEY, "
+        "reviews_count INT NOT NULL DEFAULT 0, stars_sum INT NOT NULL DEFAULT 0, "
+        + ", ".join(f"stars_{stars} INT NOT NULL DEFAULT 0" for stars in range(1, 6)) + ")")
+    valid_new = "new.stars BETWEEN 1 AND 5"
+    valid_old = "old.stars BETWEEN 1 AND 5"
+    cursor.execute(f"CREATE TRIGGER event_rating_stats_insert AFTER INSERT ON reports_about_events "
+                   f"WHEN {valid_new} BEGIN {_rating_stats_add('new', '+')} END")
+    cursor.execute(f"CREATE TRIGGER event_rating_stats_delete AFTER DELETE ON reports_about_events "
+                   f"WHEN {valid_old} BEGIN {_rating_stats_add('old', '-')} END")
+    cursor.execute(f"CREATE TRIGGER event_rating_stats_update_old AFTER UPDATE OF stars, event_id "
+                   f"ON reports_about_events WHEN {valid_old} BEGIN {_rating_stats_add('old', '-')} END")
+    cursor.execute(f"CREATE TRIGGER event_rating_stats_update_new AFTER UPDATE OF stars, event_id "
+                   f"ON reports_about_events WHEN {valid_new} BEGIN {_rating_stats_add('new', '+')} END")
+    cursor.execute(
+        "INSERT INTO event_rating_stats (event_id, reviews_count, stars_sum, "
+        + ", ".join(f"stars_{stars}" for stars in range(1, 6)) + ") "
+        "SELECT event_id, COUNT(*), SUM(stars), "
+        + ", ".join(f"SUM(stars = {stars})" for stars in range(1, 6)) + " "
+        "FROM reports_about_events WHERE stars BETWEEN 1 AND 5 GROUP BY event_id")
+
+
+def _add_event_registration(cursor: sqlite3.Cursor):
+    """
+    Adds request statuses and per-event capacity with a counter of approved requests.
+    """
+    if not column_exists(cursor, "to_events_user_requests", "status"):
+        cursor.execute("ALTER TABLE to_events_user_requests ADD COLUMN status TEXT NOT NULL DEFAULT 'pending'")
+        cursor.execute("ALTER TABLE to_events_user_requests ADD COLUMN created_at TEXT")
+    if not column_exists(cursor, "events", "capacity"):
+        cursor.execute("ALTER TABLE events ADD COLUMN capacity INT")
+        cursor.execute("ALTER TABLE events ADD COLUMN approved_count INT NOT NULL DEFAULT 0")
+        cursor.execute(
+            "UPDATE events SET approved_count = (SELECT COUNT(*) FROM to_events_user_requests r "
+            "WHERE r.event_id = events.id AND r.status = 'approved')")
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS to_events_user_requests_event_user "
+        "ON to_events_user_requests (event_id, user_id)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS to_events_user_requests_event_status "
+        "ON to_events_user_requests (event_id, status, id)")
+
+
+def _add_chat_indexes(cursor: sqlite3.Cursor):
+    """
+    Links messages to their senders and indexes chats by participants and history by chat.
+    """
+    if not column_exists(cursor, "message", "user_id"):
+        cursor.execute("ALTER TABLE message ADD COLUMN user_id INT REFERENCES users(id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS chats_user1 ON chats (user1, user2)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS chats_user2 ON chats (user2, user1)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS chat_messages_chat ON chat_messages (chat_id, message_id)")
+
+
+def _add_row_versions(cursor: sqlite3.Cursor):
+    """
+    Adds version and updated_at to users and events. Versions are bumped by every write path that changes
+    what get_my_profile, users/get_profile or get_event return, and are used as ETags.
+    """
+    for table in ("users", "events"):
+        if not column_exists(cursor, table, "version"):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN version INT NOT NULL DEFAULT 1")
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN updated_at TEXT")
+
+
+def _create_leaderboard_changes(cursor: sqlite3.Cursor):
+    """
+    Creates leaderboard_changes, a log of users whose competence points, university or role changed,
+    filled by triggers and read by LeaderboardsManager to update its rankings incrementally.
+    """
+    if table_exists(cursor, "leaderboard_changes"):
+        return
+    cursor.execute("CREATE TABLE leaderboard_changes (seq INTEGER PRIMARY KEY, user_id INT NOT NULL)")
+    cursor.execute("CREATE TRIGGER leaderboard_competence_insert AFTER INSERT ON user_competencies "
+                   "BEGIN INSERT INTO leaderboard_changes (user_id) VALUES (new.user_id); END")
+    cursor.execute("CREATE TRIGGER leaderboard_competence_delete AFTER DELETE ON user_competencies "
+                   "BEGIN INSERT INTO leaderboard_changes (user_id) VALUES (old.user_id); END")
+    cursor.execute("CREATE TRIGGER leaderboard_competence_update AFTER UPDATE OF points, user_id, competencies_id "
+                   "ON user_competencies WHEN old.points IS NOT new.points OR old.user_id != new.user_id "
+                   "OR old.competencies_id != new.competencies_id "
+                   "BEGIN INSERT INTO leaderboard_changes (user_id) SELECT old.user_id UNION SELECT new.user_id; END")
+    cursor.execute("CREATE TRIGGER leaderboard_user_update AFTER UPDATE OF univercities_id, role_id ON users "
+                   "WHEN old.univercities_id IS NOT new.univercities_id OR old.role_id != new.role_id "
+                   "BEGIN INSERT INTO leaderboard_changes (user_id) VALUES (new.id); END")
+    cursor.execute("CREATE TRIGGER leaderboard_user_delete AFTER DELETE ON users "
+                   "BEGIN INSERT INTO leaderboard_changes (user_id) VALUES (old.id); END")
+
+
+def bump_user_versions(cursor: sqlite3.Cursor, user_ids: list[int]):
+    cursor.executemany("UPDATE users SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                       [(user_id,) for user_id in user_ids])
+
+
+def bump_event_version(cursor: sqlite3.Cursor, event_id: int):
+    cursor.execute("UPDATE events SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                   (event_id,))
+
+
+def init_db():
+    """
+    Creates the tables, indexes and triggers that are not part of the original database file, in every
+    partition when partitioning is enabled. Safe to call on every start.
+    """
+
+    def job(cursor: sqlite3.Cursor):
+        _create_events_search_index(cursor)
+        _create_settlement_tables(cursor)
+        _add_test_results_owner(cursor)
+        _create_rating_stats(cursor)
+        _add_event_registration(cursor)
+        _add_chat_indexes(cursor)
+        _add_row_versions(cursor)
+        _create_leaderboard_changes(cursor)
+        cursor.execute("CREATE INDEX IF NOT EXISTS events_verified_date ON events (verified, date, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS user_api_keys_last_access "
+                       "ON user_api_keys (COALESCE(last_access, created_at))")
+
+    def directory_job(cursor: sqlite3.Cursor):
+        for statement in partitions.directory_tables:
+            cursor.execute(statement)
+
+    if partitions.enabled():
+        dbwriter.get_writer(partitions.get_common_db_path()).execute(directory_job)
+    for db_path in partitions.get_all_db_paths():
+        dbwriter.get_writer(db_path).execute(job)
+
+
+# Expression telling whether last_access of the API key "k" is older than api_key_touch_interval.
+_api_key_stale = f"COALESCE(k.last_access, k.created_at, '') < datetime('now', '{api_key_touch_interval}')"
+
+
+def _touch_api_key(hashed_key: str):
+    """
+    Records the use of an API key without waiting for the write, maintenance expires keys by last_access.
+    """
+    dbwriter.submit(lambda cursor: cursor.execute(
+        "UPDATE user_api_keys SET last_access = CURRENT_TIMESTAMP WHERE api_key = ?", (hashed_key,)))
+
+
+def get_account_auth(api_key_raw: str) -> tuple[int, int, int] | None:
+    """
+    Returns the user ID, role ID and profile version of the API key owner with one indexed lookup.
+    """
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        hashed_key = utils.CryptUtils.get_hash_512(api_key_raw)
+        cursor.execute(
+            f"SELECT u.id, u.role_id, u.version, {_api_key_stale} FROM user_api_keys k "
+            "JOIN users u ON u.id = k.user_id WHERE k.api_key = ?", (hashed_key,))
+        result = cursor.fetchone()
+    if result is None:
+        return None
+    if result[3]:
+        _touch_api_key(hashed_key)
+    return result[:3]
+
+
+def get_user_version(user_id: int) -> int | None:
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT version FROM users WHERE id = ?", (user_id,))
+        result = cursor.fetchone()
+        return result[0] if result is not None else None
+
+
+def get_event_version(event_id: int) -> int | None:
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT version FROM events WHERE id = ?", (event_id,))
+        result = cursor.fetchone()
+        return result[0] if result is not None else None
+
 
 def account_exists(email: str) -> bool:
     """
-    Check if an account with the given email exists.
+    Check if an account with the given email exists, in any university when partitioning is enabled.
     """
-    with sqlite3.connect(settings.get_main_db_path()) as conn:
+    if partitions.enabled():
+        with partitions.use_database(partitions.get_common_db_path()), read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM partition_users WHERE email = ?", (email,))
+            return cursor.fetchone() is not None
+    with read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
         result = cursor.fetchone()
         return result is not None
 
 
+def user_exists(user_id: int) -> bool:
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM users WHERE id = ?", (user_id,))
+        return cursor.fetchone() is not None
+
+
+def event_exists(event_id: int) -> bool:
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM events WHERE id = ?", (event_id,))
+        return cursor.fetchone() is not None
+
+
 def api_key_exists(api_key_raw: str) -> bool:
-    with sqlite3.connect(settings.get_main_db_path()) as conn:
+    with read_connection() as conn:
         cursor = conn.cursor()
         hashed_key = utils.CryptUtils.get_hash_512(api_key_raw)
         cursor.execute("SELECT * FROM user_api_keys WHERE api_key = ?", (hashed_key,))
@@ -28,19 +414,110 @@ def get_user_id_from_api_key(api_key_raw: str) -> int | None:
     """
     Returns the user ID associated with the given API key.
     """
-    with sqlite3.connect(settings.get_main_db_path()) as conn:
+    with read_connection() as conn:
         cursor = conn.cursor()
         hashed_key = utils.CryptUtils.get_hash_512(api_key_raw)
-        cursor.execute("SELECT user_id FROM user_api_keys WHERE api_key = ?", (hashed_key,))
+        cursor.execute(f"SELECT k.user_id, {_api_key_stale} FROM user_api_keys k WHERE k.api_key = ?", (hashed_key,))
         result = cursor.fetchone()
-        return result[0]
+    if result is None:
+        return None
+    if result[1]:
+        _touch_api_key(hashed_key)
+    return result[0]
+
+
+def get_partition_university(api_key_raw: str = None, email: str = None) -> tuple[bool, int | None]:
+    """
+    Looks up the university whose partition holds the owner of an API key, or else of an email.
+
+    Returns:
+    - tuple: Whether the key or email was found, and the university ID (None for users without a university).
+    """
+    with partitions.use_database(partitions.get_common_db_path()), read_connection() as conn:
+        cursor = conn.cursor()
+        if api_key_raw is not None:
+            cursor.execute("SELECT univercities_id FROM partition_api_keys WHERE api_key = ?",
+                           (utils.CryptUtils.get_hash_512(api_key_raw),))
+        elif email is not None:
+            cursor.execute("SELECT univercities_id FROM partition_users WHERE email = ?", (email,))
+        else:
+            return False, None
+        result = cursor.fetchone()
+        return (True, result[0]) if result is not None else (False, None)
+
+
+def _directory_execute(job: Callable[[sqlite3.Cursor], int | None]) -> int | None:
+    return dbwriter.get_writer(partitions.get_common_db_path()).execute(job)
+
+
+def register_partition_user(email: str, university_id: int | None) -> int:
+    """
+    Allocates a user ID that is unique across all partitions and records the user's university.
+
+    Raises:
+    - sqlite3.IntegrityError: If the email is already registered.
+    """
+    def job(cursor: sqlite3.Cursor) -> int:
+        cursor.execute("INSERT INTO partition_users (email, univercities_id) VALUES (?, ?)", (email, university_id))
+        return cursor.lastrowid
+
+    return _directory_execute(job)
+
+
+def set_partition_user_email(user_id: int, email: str):
+    """
+    Changes the email a user logs in with in the partition directory.
+
+    Raises:
+    - sqlite3.IntegrityError: If the email is already registered.
+    """
+    _directory_execute(lambda cursor: cursor.execute(
+        "UPDATE partition_users SET email = ? WHERE user_id = ?", (email, user_id)))
+
+
+def register_partition_api_key(api_key_hashed: str, university_id: int | None):
+    _directory_execute(lambda cursor: cursor.execute(
+        "INSERT OR REPLACE INTO partition_api_keys (api_key, univercities_id) VALUES (?, ?)",
+        (api_key_hashed, university_id)))
+
+
+def unregister_partition_api_keys(api_keys_hashed: list[str]):
+    """
+    Removes API keys deleted from their partition from the partition directory.
+    """
+    _directory_execute(lambda cursor: cursor.execute(
+        "DELETE FROM partition_api_keys WHERE api_key IN (SELECT value FROM json_each(?))",
+        (json.dumps(api_keys_hashed),)))
+
+
+def unregister_partition_user(user_id: int, api_key_hashed: str):
+    """
+    Removes a user and their API key from the partition directory, used when the user could not be created in
+    their partition.
+    """
+    def job(cursor: sqlite3.Cursor):
+        cursor.execute("DELETE FROM partition_api_keys WHERE api_key = ?", (api_key_hashed,))
+        cursor.execute("DELETE FROM partition_users WHERE user_id = ?", (user_id,))
+
+    _directory_execute(job)
+
+
+def register_partition_event(university_id: int | None) -> int:
+    """
+    Allocates an event ID that is unique across all partitions.
+    """
+    def job(cursor: sqlite3.Cursor) -> int:
+        cursor.execute("INSERT INTO partition_events (univercities_id) VALUES (?)", (university_id,))
+        return cursor.lastrowid
+
+    return _directory_execute(job)
 
 
 def is_new_ip_for_user(ip_address: str, user_id: int) -> bool:
     """
     Returns whether or not the given IP address is associated with the given user ID.
     """
-    with sqlite3.connect(settings.get_main_db_path()) as conn:
+    with read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM user_api_keys WHERE ip_address = ? AND user_id = ?", (ip_address, user_id))
         result = cursor.fetchone()
@@ -48,8 +525,7 @@ def is_new_ip_for_user(ip_address: str, user_id: int) -> bool:
 
 
 def generate_dummy_indicators():
-    with sqlite3.connect(settings.get_main_db_path()) as conn:
-        cursor = conn.cursor()
+    def job(cursor: sqlite3.Cursor):
         for i in range(50):
             ind_type = 1
             if i % 2 == 0:
@@ -58,4 +534,5 @@ def generate_dummy_indicators():
                 "INSERT INTO indicators (id, type, name) VALUES (?, ?, ?)",
                 (i, ind_type, f"Индикатор {i}",)
             )
-        conn.commit()
+
+    dbwriter.execute(job)
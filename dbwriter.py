@@ -0,0 +1,175 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Callable, TypeVar
+
+import partitions
+
+T = TypeVar("T")
+
+# Maximum number of queued jobs that are committed together in one transaction.
+max_batch_size = 64
+
+
+class TracingCursor(sqlite3.Cursor):
+    """
+    A cursor that calls its tracer with the SQL of every execute call before running it. Unlike the trace callback
+    of a connection, SQLite does not report the statement again for every trigger it fires.
+    """
+    tracer: Callable[[str], None] | None = None
+
+    def execute(self, sql: str, parameters=()):
+        if self.tracer is not None:
+            self.tracer(sql)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters):
+        if self.tracer is not None:
+            self.tracer(sql)
+        return super().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script: str):
+        if self.tracer is not None:
+            self.tracer(sql_script)
+        return super().executescript(sql_script)
+
+
+class DatabaseWriter:
+    """
+    Owns the only write connection to the main database.
+
+    Write jobs are callables that receive a cursor and are executed one after another on a dedicated thread.
+    Jobs that are already waiting in the queue are grouped into a single transaction (group commit), every job
+    runs inside its own savepoint, so a failing job is rolled back without affecting the others in the batch.
+
+    Attributes:
+        db_path (str): The path to the database file.
+        attached (dict): Databases attached to the write connection, by schema name.
+    """
+
+    def __init__(self, db_path: str, attached: dict[str, str] = None):
+        self.db_path = db_path
+        self.attached = attached or {}
+        self.__jobs: queue.Queue = queue.Queue()
+        self.__tracer: Callable[[str], None] | None = None
+        self.__thread = threading.Thread(target=self.__run, name="campus-db-writer", daemon=True)
+        self.__thread.start()
+
+    def submit(self, job: Callable[[sqlite3.Cursor], T]) -> Future:
+        """
+        Queues a write job and returns a future that resolves once its transaction is committed.
+        """
+        future = Future()
+        if threading.current_thread() is self.__thread:
+            # Job submitted from inside another job: it already runs in the writer transaction.
+            try:
+                future.set_result(job(self.__cursor()))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self.__jobs.put((job, future))
+        return future
+
+    def execute(self, job: Callable[[sqlite3.Cursor], T]) -> T:
+        """
+        Queues a write job and blocks until it is committed. Exceptions raised by the job are re-raised here.
+        """
+        return self.submit(job).result()
+
+    def set_trace_callback(self, callback: Callable[[str], None] | None):
+        """
+        Makes write jobs call the callback with the SQL of every statement they execute, None switches it off.
+        """
+        def job(cursor: sqlite3.Cursor):
+            self.__tracer = callback
+
+        self.execute(job)
+
+    def __cursor(self) -> sqlite3.Cursor:
+        if self.__tracer is None:
+            return self.__conn.cursor()
+        cursor = self.__conn.cursor(TracingCursor)
+        cursor.tracer = self.__tracer
+        return cursor
+
+    def __connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for name, path in self.attached.items():
+            conn.execute("ATTACH DATABASE ? AS " + name, (path,))
+        return conn
+
+    def __run(self):
+        self.__conn = self.__connect()
+        while True:
+            batch = [self.__jobs.get()]
+            while len(batch) < max_batch_size:
+                try:
+                    batch.append(self.__jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self.__run_batch(batch)
+
+    def __run_batch(self, batch: list):
+        cursor = self.__cursor()
+        results = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for job, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                cursor.execute("SAVEPOINT job")
+                try:
+                    results.append((future, job(cursor), None))
+                    cursor.execute("RELEASE job")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO job")
+                    cursor.execute("RELEASE job")
+                    results.append((future, None, e))
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if self.__conn.in_transaction:
+                self.__conn.rollback()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_writers: dict[str, DatabaseWriter] = {}
+_writer_lock = threading.Lock()
+
+
+def get_writer(db_path: str = None) -> DatabaseWriter:
+    """
+    Returns the process-wide writer of a database file, starting its thread on first use. By default the database
+    the current thread is routed to (see partitions.current_db_path()), the main database unless partitioning is on.
+    """
+    db_path = db_path or partitions.current_db_path()
+    with _writer_lock:
+        writer = _writers.get(db_path)
+        if writer is None:
+            writer = _writers[db_path] = DatabaseWriter(db_path, partitions.attached_databases(db_path))
+        return writer
+
+
+def execute(job: Callable[[sqlite3.Cursor], T]) -> T:
+    """
+    Runs a write job on the writer of the current database and returns its result.
+    """
+    return get_writer().execute(job)
+
+
+def submit(job: Callable[[sqlite3.Cursor], T]) -> Future:
+    """
+    Queues a write job on the writer of the current database without waiting for it.
+    """
+    return get_writer().submit(job)
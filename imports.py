@@ -0,0 +1,252 @@
+import csv
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Iterator
+
+import dbmanager
+import dbwriter
+import utils
+
+
+class ImportManager:
+    """
+    Bulk import of users and events from XLSX or CSV files.
+
+    Files are read as a stream (openpyxl read-only mode for XLSX), the first row holds the column names.
+    Rows are validated and inserted in batches, one writer transaction per batch. Invalid rows are reported
+    with their line number and skipped. In dry-run mode nothing is written and only the report is returned.
+
+    Users columns: email, first_name, second_name, third_name, password, university_id, role_id (optional).
+    Events columns: name, description, date ("%Y-%m-%d %H:%M:%S"), address, organizer_id,
+    indicators (optional, ids separated by ";"), picture (optional relative path).
+    """
+    kinds = ("users", "events")
+    max_reported_errors = 1000
+
+    @classmethod
+    def import_file(cls, kind: str, path: str, dry_run: bool = False, batch_size: int = 1000,
+                    workers: int = None) -> dict:
+        """
+        Imports users or events from a file.
+
+        Parameters:
+        - kind (str): "users" or "events".
+        - path (str): The path to the .xlsx or .csv file.
+        - dry_run (bool): Only validate the rows and report what would be imported.
+        - batch_size (int): The number of rows inserted per transaction.
+        - workers (int): The number of processes hashing passwords, the number of CPUs by default.
+
+        Returns:
+        - dict: The number of valid, inserted and rejected rows and the first rejected rows with reasons.
+
+        Raises:
+        - ValueError: If the kind or the file format is not supported.
+        - sqlite3.DatabaseError: If there is an error with the database.
+        """
+        if kind not in cls.kinds:
+            raise ValueError(f"unknown import {kind}")
+        report = {"dry_run": dry_run, "valid": 0, "inserted": 0, "rejected": 0, "errors": []}
+        rows = cls.__read_rows(path)
+        if kind == "users" and dry_run:
+            # Passwords are hashed only for inserted rows, a dry run does not need the worker processes.
+            cls.__import_users(rows, report, dry_run, batch_size, None)
+        elif kind == "users":
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                cls.__import_users(rows, report, dry_run, batch_size, pool)
+        else:
+            cls.__import_events(rows, report, dry_run, batch_size)
+        report["errors"].sort(key=lambda error: error["line"])
+        return report
+
+    @classmethod
+    def __read_rows(cls, path: str) -> Iterator[tuple[int, dict]]:
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".xlsx":
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(path, read_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                header = [str(cell).strip() if cell is not None else "" for cell in next(rows, [])]
+                for line, values in enumerate(rows, 2):
+                    if all(value is None for value in values):
+                        continue
+                    yield line, dict(zip(header, values))
+            finally:
+                workbook.close()
+        elif extension == ".csv":
+            with open(path, "r", encoding="utf-8-sig", newline="") as file:
+                reader = csv.DictReader(file)
+                for row in reader:
+                    yield reader.line_num, row
+        else:
+            raise ValueError(f"unsupported file format {extension}")
+
+    @classmethod
+    def __reject(cls, report: dict, line: int, message: str):
+        report["rejected"] += 1
+        if len(report["errors"]) < cls.max_reported_errors:
+            report["errors"].append({"line": line, "message": message})
+
+    @classmethod
+    def __text(cls, row: dict, field: str, required: bool = True) -> str | None:
+        value = row.get(field)
+        value = str(value).strip() if value is not None else ""
+        if not value:
+            if required:
+                raise ValueError(f"{field} is required")
+            return None
+        return value
+
+    @classmethod
+    def __integer(cls, row: dict, field: str, default: int = None) -> int:
+        value = row.get(field)
+        if value is None or value == "":
+            if default is None:
+                raise ValueError(f"{field} is required")
+            return default
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} must be an integer")
+
+    @classmethod
+    def __import_users(cls, rows: Iterator[tuple[int, dict]], report: dict, dry_run: bool, batch_size: int,
+                       pool: ProcessPoolExecutor | None):
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM univercities")
+            universities = {row[0] for row in cursor.fetchall()}
+            cursor.execute("SELECT id FROM roles")
+            roles = {row[0] for row in cursor.fetchall()}
+
+        seen_emails = set()
+        batch = []
+        for line, row in rows:
+            try:
+                email = cls.__text(row, "email")
+                if not utils.email_is_valid(email):
+                    raise ValueError("invalid email")
+                if email in seen_emails:
+                    raise ValueError(f"duplicate email {email}")
+                university_id = cls.__integer(row, "university_id")
+                if university_id not in universities:
+                    raise ValueError(f"unknown university_id {university_id}")
+                role_id = cls.__integer(row, "role_id", 1)
+                if role_id not in roles:
+                    raise ValueError(f"unknown role_id {role_id}")
+                user = (cls.__text(row, "first_name"), cls.__text(row, "second_name", False),
+                        cls.__text(row, "third_name", False), email, cls.__text(row, "password"), university_id,
+                        role_id)
+            except ValueError as e:
+                cls.__reject(report, line, str(e))
+                continue
+            seen_emails.add(email)
+            batch.append((line, user))
+            if len(batch) >= batch_size:
+                cls.__flush_users(batch, report, dry_run, pool)
+                batch = []
+        if batch:
+            cls.__flush_users(batch, report, dry_run, pool)
+
+    @classmethod
+    def __flush_users(cls, batch: list, report: dict, dry_run: bool, pool: ProcessPoolExecutor | None):
+        emails = [user[3] for _, user in batch]
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT email FROM users WHERE email IN ({','.join('?' * len(emails))})", emails)
+            existing = {row[0] for row in cursor.fetchall()}
+
+        users = []
+        for line, user in batch:
+            if user[3] in existing:
+                cls.__reject(report, line, f"account {user[3]} already exists")
+            else:
+                users.append(user)
+        report["valid"] += len(users)
+        if dry_run or not users:
+            return
+
+        passwords = pool.map(utils.CryptUtils.get_hash_512, [user[4] for user in users],
+                             chunksize=max(1, len(users) // 32))
+        rows = [(first_name, second_name, third_name, email, password_hashed, university_id, role_id)
+                for (first_name, second_name, third_name, email, _, university_id, role_id), password_hashed in
+                zip(users, passwords)]
+        dbwriter.execute(lambda cursor: cursor.executemany(
+            "INSERT INTO users (firstname, secondname, thirdname, email, password, univercities_id, role_id) "
+            "VALUES (?,?,?,?,?,?,?)", rows))
+        report["inserted"] += len(rows)
+
+    @classmethod
+    def __import_events(cls, rows: Iterator[tuple[int, dict]], report: dict, dry_run: bool, batch_size: int):
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM indicators")
+            indicators = {row[0] for row in cursor.fetchall()}
+
+        batch = []
+        for line, row in rows:
+            try:
+                date = row.get("date")
+                if not isinstance(date, datetime):
+                    try:
+                        date = datetime.strptime(cls.__text(row, "date"), "%Y-%m-%d %H:%M:%S")
+                    except ValueError:
+                        raise ValueError("date must be in format YYYY-MM-DD HH:MM:SS")
+                event_indicators = []
+                for indicator_id in (cls.__text(row, "indicators", False) or "").split(";"):
+                    if not indicator_id.strip():
+                        continue
+                    if not indicator_id.strip().isdigit() or int(indicator_id) not in indicators:
+                        raise ValueError(f"unknown indicator {indicator_id.strip()}")
+                    event_indicators.append(int(indicator_id))
+                event = (cls.__text(row, "name"), cls.__text(row, "description", False),
+                         date.strftime("%Y-%m-%d %H:%M:%S"), cls.__text(row, "address", False),
+                         cls.__integer(row, "organizer_id"), cls.__text(row, "picture", False), event_indicators)
+            except ValueError as e:
+                cls.__reject(report, line, str(e))
+                continue
+            batch.append((line, event))
+            if len(batch) >= batch_size:
+                cls.__flush_events(batch, report, dry_run)
+                batch = []
+        if batch:
+            cls.__flush_events(batch, report, dry_run)
+
+    @classmethod
+    def __flush_events(cls, batch: list, report: dict, dry_run: bool):
+        organizer_ids = list({event[4] for _, event in batch})
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id FROM users WHERE id IN ({','.join('?' * len(organizer_ids))})",
+                           organizer_ids)
+            organizers = {row[0] for row in cursor.fetchall()}
+
+        events = []
+        for line, event in batch:
+            if event[4] not in organizers:
+                cls.__reject(report, line, f"unknown organizer_id {event[4]}")
+            else:
+                events.append(event)
+        report["valid"] += len(events)
+        if dry_run or not events:
+            return
+
+        def job(cursor: sqlite3.Cursor):
+            pictures, links = [], []
+            for name, description, date, address, organizer_id, picture, event_indicators in events:
+                cursor.execute(
+                    "INSERT INTO events (name, description, date, address, verified, organizer_id) "
+                    "VALUES (?,?,?,?,0,?)", (name, description, date, address, organizer_id))
+                event_id = cursor.lastrowid
+                if picture is not None:
+                    pictures.append((event_id, picture, event_id))
+                links += [(event_id, indicator_id) for indicator_id in event_indicators]
+            cursor.executemany("INSERT INTO events_pictures (id, path_to_picture, event_id) VALUES (?,?,?)",
+                               pictures)
+            cursor.executemany("INSERT INTO events_indicators (event_id, indicator_id) VALUES (?,?)", links)
+
+        dbwriter.execute(job)
+        report["inserted"] += len(events)
@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from typing import Callable
+
+import dbmanager
+import dbwriter
+import partitions
+import settings
+import utils
+
+
+class MaintenanceTask:
+    def __init__(self, name: str, interval: float, run: Callable[[], str]):
+        self.name = name
+        self.interval = interval
+        self.run = run
+        self.next_run = time.monotonic() + interval
+
+
+class MaintenanceScheduler:
+    """
+    Runs database maintenance periodically on a background thread.
+
+    Every task writes through dbwriter in short transactions, so regular writes are never blocked for long.
+    Every run is logged with its duration through utils.OpStatus. With partitioning enabled, every task runs on
+    each partition.
+
+    Tasks:
+        expire_api_keys: deletes API keys not used for api_key_ttl_days, in batches, and their entries in the
+            partition directory.
+        optimize: PRAGMA optimize, which runs ANALYZE on tables whose statistics are outdated.
+        analyze: ANALYZE of all tables, sampling at most analysis_limit rows per index.
+        checkpoint: passive WAL checkpoint from a separate connection, it does not take the write lock.
+        prune_leaderboard_changes: deletes leaderboard_changes rows except the newest leaderboard_changes_kept,
+            a process that missed pruned rows rebuilds its leaderboards.
+        incremental_vacuum: returns a limited number of free pages to the file system when the database uses
+            auto_vacuum=INCREMENTAL (see "python cli.py enable-incremental-vacuum").
+    """
+    expire_batch_size = 500
+    expire_batch_pause = 0.05
+    vacuum_pages = 200
+    leaderboard_changes_kept = 100000
+    # Rows sampled per index by ANALYZE, so it runs in bounded time on large tables.
+    analysis_limit = 400
+
+    def __init__(self, options: dict = None):
+        options = settings.get_maintenance_settings() if options is None else options
+        self.api_key_ttl_days = options.get("api_key_ttl_days", 90)
+        self.tasks = [
+            MaintenanceTask("expire_api_keys", options.get("expire_api_keys_interval", 3600), self.expire_api_keys),
+            MaintenanceTask("optimize", options.get("optimize_interval", 3600), self.optimize),
+            MaintenanceTask("analyze", options.get("analyze_interval", 7 * 24 * 3600), self.analyze),
+            MaintenanceTask("checkpoint", options.get("checkpoint_interval", 300), self.checkpoint),
+            MaintenanceTask("prune_leaderboard_changes", options.get("prune_leaderboard_changes_interval", 3600),
+                            self.prune_leaderboard_changes),
+            MaintenanceTask("incremental_vacuum", options.get("vacuum_interval", 3600), self.incremental_vacuum),
+        ]
+        self.__stopped = threading.Event()
+        self.__thread: threading.Thread | None = None
+
+    def start(self):
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__loop, name="campus-maintenance", daemon=True)
+            self.__thread.start()
+
+    def stop(self):
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def run_all(self):
+        """
+        Runs every task once, now.
+        """
+        for task in self.tasks:
+            self.__run(task)
+
+    def __loop(self):
+        while not self.__stopped.is_set():
+            task = min(self.tasks, key=lambda t: t.next_run)
+            if self.__stopped.wait(max(task.next_run - time.monotonic(), 0)):
+                break
+            try:
+                self.__run(task)
+            except Exception:
+                # One failure, e.g. listing the partitions, must not stop the scheduler thread.
+                traceback.print_exc()
+            task.next_run = time.monotonic() + task.interval
+
+    def __run(self, task: MaintenanceTask):
+        for db_path in partitions.get_all_db_paths():
+            name = f"{task.name} ({os.path.basename(db_path)})" if partitions.enabled() else task.name
+            started = time.perf_counter()
+            try:
+                with partitions.use_database(db_path):
+                    details = task.run()
+                self.__report(f"Maintenance {name} took {(time.perf_counter() - started) * 1000:.1f} ms: {details}",
+                              True)
+            except Exception as e:
+                self.__report(f"Maintenance {name} failed after {(time.perf_counter() - started) * 1000:.1f} ms: "
+                              f"{e}", False)
+
+    @staticmethod
+    def __report(message: str, status: bool):
+        try:
+            utils.OpStatus(message, status)
+        except Exception:
+            traceback.print_exc()
+
+    def expire_api_keys(self) -> str:
+        # Timestamps are stored by CURRENT_TIMESTAMP in UTC, so the cutoff is computed by SQLite as well.
+        cutoff = f"-{int(self.api_key_ttl_days)} days"
+
+        def job(cursor: sqlite3.Cursor) -> list[str]:
+            cursor.execute(
+                "DELETE FROM user_api_keys WHERE id IN (SELECT id FROM user_api_keys "
+                "WHERE COALESCE(last_access, created_at) < datetime('now', ?) LIMIT ?) RETURNING api_key",
+                (cutoff, self.expire_batch_size))
+            return [row[0] for row in cursor.fetchall()]
+
+        expired = 0
+        while not self.__stopped.is_set():
+            api_keys = dbwriter.execute(job)
+            if api_keys and partitions.enabled():
+                dbmanager.unregister_partition_api_keys(api_keys)
+            deleted = len(api_keys)
+            expired += deleted
+            if deleted < self.expire_batch_size:
+                break
+            time.sleep(self.expire_batch_pause)
+        return f"{expired} keys expired"
+
+    def prune_leaderboard_changes(self) -> str:
+        def job(cursor: sqlite3.Cursor) -> int:
+            cursor.execute(
+                "DELETE FROM leaderboard_changes WHERE seq <= (SELECT MAX(seq) FROM leaderboard_changes) - ?",
+                (self.leaderboard_changes_kept,))
+            return cursor.rowcount
+
+        return f"{dbwriter.execute(job)} leaderboard changes pruned"
+
+    def optimize(self) -> str:
+        dbwriter.execute(lambda cursor: cursor.execute("PRAGMA optimize"))
+        return "done"
+
+    def analyze(self) -> str:
+        def job(cursor: sqlite3.Cursor):
+            cursor.execute(f"PRAGMA analysis_limit = {self.analysis_limit}")
+            cursor.execute("ANALYZE")
+
+        dbwriter.execute(job)
+        return "done"
+
+    def checkpoint(self) -> str:
+        conn = sqlite3.connect(partitions.current_db_path(), isolation_level=None, timeout=1)
+        try:
+            busy, log_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        finally:
+            conn.close()
+        return f"{checkpointed}/{log_pages} WAL pages checkpointed" + (", readers busy" if busy else "")
+
+    def incremental_vacuum(self) -> str:
+        def job(cursor: sqlite3.Cursor) -> str:
+            cursor.execute("PRAGMA auto_vacuum")
+            if cursor.fetchone()[0] != 2:
+                return "skipped, auto_vacuum is not INCREMENTAL"
+            cursor.execute("PRAGMA freelist_count")
+            free_pages = cursor.fetchone()[0]
+            cursor.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages})").fetchall()
+            return f"{min(free_pages, self.vacuum_pages)} of {free_pages} free pages released"
+
+        return dbwriter.execute(job)
+
+
+def enable_incremental_vacuum():
+    """
+    Switches the database, or every partition, to auto_vacuum=INCREMENTAL. Runs a full VACUUM, so the API must be
+    stopped.
+    """
+    for db_path in partitions.get_all_db_paths():
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        try:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
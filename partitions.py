@@ -0,0 +1,230 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import settings
+
+# Tables shared by all universities, they are kept in the common database file.
+reference_tables = ("univercities", "roles", "indicators", "competencies", "competence_level", "competenices_levels",
+                    "levels_indicators", "restrictions_for_events", "test_type")
+
+# Directory of the common database: maps globally allocated user and event IDs, emails and API keys to universities.
+directory_tables = (
+    "CREATE TABLE IF NOT EXISTS partition_users (user_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "email TEXT NOT NULL UNIQUE, univercities_id INT)",
+    "CREATE TABLE IF NOT EXISTS partition_api_keys (api_key TEXT PRIMARY KEY, univercities_id INT)",
+    "CREATE TABLE IF NOT EXISTS partition_events (event_id INTEGER PRIMARY KEY AUTOINCREMENT, univercities_id INT)",
+)
+
+# Row filters of the partitioned tables, applied in this order. Filters refer to the rows already copied into the
+# partition ("main") and to the source database ("src"), :university is the university of the partition.
+partition_filters = {
+    "users": "univercities_id IS :university",
+    "events": "organizer_id IN (SELECT id FROM main.users)",
+    "chats": "user1 IN (SELECT id FROM main.users)",
+    "chat_messages": "chat_id IN (SELECT id FROM main.chats)",
+    "message": "id IN (SELECT message_id FROM main.chat_messages)",
+    "user_tests_results": "user_id IN (SELECT id FROM main.users)",
+    "user_tests_history": "user_tests_results_id IN (SELECT id FROM main.user_tests_results)",
+}
+
+_local = threading.local()
+
+
+def enabled() -> bool:
+    return settings.get_partitioning_settings().get("enabled", False)
+
+
+def get_common_db_path() -> str:
+    return os.path.join(settings.get_partitioning_settings()["dir"], "common.db")
+
+
+def get_db_path(university_id: int | None) -> str:
+    """
+    Returns the database file of a university, users without a university are kept in "unassigned.db".
+    """
+    return os.path.join(settings.get_partitioning_settings()["dir"], _partition_file_name(university_id))
+
+
+def get_all_db_paths() -> list[str]:
+    """
+    Returns the database files holding per-university data: every existing partition file when partitioning is
+    enabled, otherwise only the main database.
+    """
+    if not enabled():
+        return [settings.get_main_db_path()]
+    directory = settings.get_partitioning_settings()["dir"]
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith(".db") and name != "common.db")
+
+
+def current_db_path() -> str:
+    """
+    Returns the database file used by reads and writes of the current thread: the main database when partitioning
+    is disabled, otherwise the partition selected with use() or use_database(), or the common database.
+    """
+    if not enabled():
+        return settings.get_main_db_path()
+    path = getattr(_local, "path", None)
+    return path if path is not None else get_common_db_path()
+
+
+def attached_databases(db_path: str) -> dict[str, str]:
+    """
+    Returns the databases to attach to a connection of db_path, so unqualified reference tables resolve to the
+    common database.
+    """
+    if not enabled() or db_path == get_common_db_path():
+        return {}
+    return {"common": get_common_db_path()}
+
+
+def current_university() -> int | None:
+    """
+    Returns the university of the partition selected with use(), None if there is none.
+    """
+    return getattr(_local, "university_id", None)
+
+
+@contextmanager
+def use_database(db_path: str, university_id: int | None = None):
+    """
+    Routes every read and write of the current thread inside the block to the given database file.
+    """
+    previous = getattr(_local, "path", None), getattr(_local, "university_id", None)
+    _local.path, _local.university_id = db_path, university_id
+    try:
+        yield
+    finally:
+        _local.path, _local.university_id = previous
+
+
+@contextmanager
+def use(university_id: int | None):
+    """
+    Routes every read and write of the current thread inside the block to the partition of a university.
+    Does nothing when partitioning is disabled.
+    """
+    if not enabled():
+        yield
+        return
+    with use_database(get_db_path(university_id), university_id):
+        yield
+
+
+def split_database(target_dir: str, source_path: str = None) -> dict[str, int]:
+    """
+    Splits the main database into a common database with the reference tables and the partition directory, and one
+    database per university with its users and their API keys, indicators, competencies, test results and chats,
+    and the events they organize with everything linked to them. Rows of other tables are assigned by their event_id,
+    or else by their user_id. The API must be stopped, the source database is not modified.
+
+    Parameters:
+    - target_dir (str): The directory for the new files, it must not contain databases yet.
+    - source_path (str): The database to split, the main database by default.
+
+    Returns:
+    - dict: The number of users per partition file name.
+
+    Raises:
+    - FileExistsError: If the target directory already contains a database.
+    """
+    source_path = source_path or settings.get_main_db_path()
+    os.makedirs(target_dir, exist_ok=True)
+    if any(name.endswith(".db") for name in os.listdir(target_dir)):
+        raise FileExistsError(f"{target_dir} already contains databases")
+
+    source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+    try:
+        schema = source.execute(
+            "SELECT type, name, tbl_name, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+            "ORDER BY rowid").fetchall()
+        # "unassigned.db" is always created, requests of unknown API keys are routed there.
+        university_ids = [row[0] for row in source.execute("SELECT id FROM univercities ORDER BY id")] + [None]
+    finally:
+        source.close()
+    virtual_tables = {name for kind, name, _, sql in schema if sql.upper().startswith("CREATE VIRTUAL TABLE")}
+    tables = [name for kind, name, _, _ in schema if kind == "table" and
+              not any(name.startswith(f"{virtual}_") for virtual in virtual_tables)]
+
+    common = _copy_tables(source_path, os.path.join(target_dir, "common.db"), schema,
+                          [name for name in tables if name in reference_tables], virtual_tables)
+    users = {}
+    try:
+        for statement in directory_tables:
+            common.execute(statement)
+        common.execute("BEGIN")
+        for university_id in university_ids:
+            path = os.path.join(target_dir, _partition_file_name(university_id))
+            conn = _copy_tables(source_path, path, schema, [name for name in tables if name not in reference_tables],
+                                virtual_tables, True, university_id)
+            try:
+                user_rows = conn.execute("SELECT id, email FROM users").fetchall()
+                common.executemany("INSERT INTO partition_users (user_id, email, univercities_id) VALUES (?, ?, ?)",
+                                   [(user_id, email, university_id) for user_id, email in user_rows])
+                common.executemany("INSERT INTO partition_api_keys (api_key, univercities_id) VALUES (?, ?)",
+                                   [(api_key, university_id) for api_key, in
+                                    conn.execute("SELECT api_key FROM user_api_keys")])
+                common.executemany("INSERT INTO partition_events (event_id, univercities_id) VALUES (?, ?)",
+                                   [(event_id, university_id) for event_id, in conn.execute("SELECT id FROM events")])
+                users[os.path.basename(path)] = len(user_rows)
+            finally:
+                conn.close()
+        # IDs of new users and events continue after the highest IDs of the source database.
+        source_sequences = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+        try:
+            sequences = dict(source_sequences.execute(
+                "SELECT name, seq FROM sqlite_sequence WHERE name IN ('users', 'events')").fetchall())
+        finally:
+            source_sequences.close()
+        common.execute("DELETE FROM sqlite_sequence WHERE name IN ('partition_users', 'partition_events')")
+        common.executemany("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                           [("partition_users", sequences.get("users", 0)),
+                            ("partition_events", sequences.get("events", 0))])
+        common.execute("COMMIT")
+    finally:
+        common.close()
+    return users
+
+
+def _partition_file_name(university_id: int | None) -> str:
+    return f"university_{university_id}.db" if university_id is not None else "unassigned.db"
+
+
+def _copy_tables(source_path: str, path: str, schema: list[tuple], tables: list[str], virtual_tables: set[str],
+                 partitioned: bool = False, university_id: int | None = None) -> sqlite3.Connection:
+    """
+    Creates the given tables with their indexes and triggers in a new database and copies their rows from the
+    source, only the rows of the university if partitioned is set.
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("ATTACH DATABASE ? AS src", (f"file:{source_path}?mode=ro",))
+    conn.execute("BEGIN")
+    for kind, name, _, sql in schema:
+        if kind == "table" and name in tables:
+            conn.execute(sql)
+    for name in [name for name in partition_filters if name in tables] + \
+                [name for name in tables if name not in partition_filters]:
+        if name in virtual_tables:
+            continue
+        where = None
+        if partitioned:
+            columns = [row[1] for row in conn.execute(f"PRAGMA src.table_info({name})")]
+            where = partition_filters.get(name)
+            if where is None and "event_id" in columns:
+                where = "event_id IN (SELECT id FROM main.events)"
+            elif where is None and "user_id" in columns:
+                where = "user_id IN (SELECT id FROM main.users)"
+        conn.execute(f"INSERT INTO main.{name} SELECT * FROM src.{name}" + (f" WHERE {where}" if where else ""),
+                     {"university": university_id})
+    # Indexes and triggers are created after the rows are copied, so triggers do not fire for copied rows.
+    for kind, _, table, sql in schema:
+        if kind in ("index", "trigger") and table in tables:
+            conn.execute(sql)
+    for name in virtual_tables.intersection(tables):
+        conn.execute(f"INSERT INTO {name} ({name}) VALUES ('rebuild')")
+    conn.execute("COMMIT")
+    conn.execute("DETACH DATABASE src")
+    return conn
@@ -0,0 +1,213 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from typing import Callable
+
+import dbmanager
+import dbwriter
+import settings
+import utils
+
+# Maximum number of SQL statements (without transaction control) each endpoint may execute per request.
+budgets = {
+    "get_my_profile": 3,
+    "users/get_profile": 3,
+    "users/get_profiles": 5,
+    "get_event_list": 4,
+    "get_all_indicators": 3,
+    "get_all_universities": 3,
+    "get_event": 5,
+    "get_suggested_events": 4,
+    "search_events": 4,
+    "get_event_reviews": 5,
+    "events/get_requests": 7,
+    "chats/list": 4,
+    "chats/history": 5,
+    "batch": 5,
+    "set_my_profile_info": 6,
+    "add_event_review": 8,
+    "events/join": 7,
+    "leaderboard": 6,
+    "leaderboard/my_position": 4,
+}
+
+api_key = "campus_querybudgetquerybudgetquerybudg"
+transaction_control = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+class StatementCounter:
+    """
+    Statement tracer (see dbmanager.set_statement_tracer) that records the statements executed by the application,
+    one per execute call, so repeated identical queries are counted and statements run by triggers are not.
+    """
+
+    def __init__(self):
+        self.statements: list[str] = []
+        self.__lock = threading.Lock()
+
+    def __call__(self, statement: str):
+        if statement.lstrip().upper().startswith(transaction_control):
+            return
+        with self.__lock:
+            self.statements.append(statement)
+
+    def reset(self):
+        with self.__lock:
+            self.statements = []
+
+
+def seed(scale: int, picture_path: str) -> dict:
+    """
+    Adds a realistic amount of data for the given scale: users with indicators and competencies, verified events
+    with indicators, pictures, reviews and join requests, and a chat. Returns the IDs the requests refer to.
+    """
+
+    def job(cursor: sqlite3.Cursor) -> dict:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM users")
+        first_user = cursor.fetchone()[0] + 1
+        # The first seeded user is the organizer sending the requests, the others are students.
+        users = [(f"Студент {first_user + i}", f"budget{first_user + i}@campus.ru", i % 5 + 1, 3 if i == 0 else 1)
+                 for i in range(100 * scale)]
+        cursor.executemany(
+            "INSERT INTO users (firstname, secondname, thirdname, email, password, univercities_id, role_id) "
+            "VALUES (?, 'Тестов', 'Тестович', ?, 'x', ?, ?)", users)
+        cursor.execute("SELECT id FROM users WHERE email LIKE 'budget%@campus.ru' ORDER BY role_id DESC, id")
+        user_ids = [row[0] for row in cursor.fetchall()]
+        cursor.executemany("INSERT INTO user_indicators (indicator_id, user_id) VALUES (?, ?)",
+                           [(indicator_id, user_id) for user_id in user_ids for indicator_id in (1, 2, 3)])
+        cursor.executemany(
+            "INSERT INTO user_competencies (user_id, competencies_id, points) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id, competencies_id) DO NOTHING",
+            [(user_id, competence_id, user_id * competence_id % 900) for user_id in user_ids
+             for competence_id in range(1, 13)])
+
+        event_ids = []
+        for i in range(40 * scale):
+            cursor.execute(
+                "INSERT INTO events (name, description, date, address, verified, organizer_id) "
+                "VALUES (?, ?, '2030-01-01 10:00:00', 'Тюмень', 1, ?)",
+                (f"Хакатон {i}", "Командное соревнование студентов", user_ids[0]))
+            event_ids.append(cursor.lastrowid)
+        cursor.executemany("INSERT INTO events_pictures (id, path_to_picture, event_id) VALUES (?, ?, ?)",
+                           [(event_id, picture_path, event_id) for event_id in event_ids])
+        cursor.executemany("INSERT INTO events_indicators (event_id, indicator_id) VALUES (?, ?)",
+                           [(event_id, event_id % 10) for event_id in event_ids] +
+                           [(event_id, 1) for event_id in event_ids])
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM reports_about_events")
+        review_id = cursor.fetchone()[0]
+        cursor.executemany(
+            "INSERT INTO reports_about_events (id, event_id, user_id, stars, text) VALUES (?, ?, ?, ?, 'ok')",
+            [(review_id + i + 1, event_ids[0], user_id, user_id % 5 + 1) for i, user_id in enumerate(user_ids[1:])])
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM to_events_user_requests")
+        request_id = cursor.fetchone()[0]
+        cursor.executemany(
+            "INSERT INTO to_events_user_requests (id, event_id, user_id, status) VALUES (?, ?, ?, 'pending')",
+            [(request_id + i + 1, event_ids[0], user_id) for i, user_id in enumerate(user_ids[1:])])
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM chats")
+        chat_id = cursor.fetchone()[0] + 1
+        cursor.execute("INSERT INTO chats (id, user1, user2) VALUES (?, ?, ?)", (chat_id, user_ids[0], user_ids[1]))
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM message")
+        message_id = cursor.fetchone()[0]
+        cursor.executemany("INSERT INTO message (id, text, timestamp, user_id) VALUES (?, 'привет', '', ?)",
+                           [(message_id + i + 1, user_ids[0]) for i in range(100 * scale)])
+        cursor.executemany("INSERT INTO chat_messages (id, chat_id, message_id) VALUES (?, ?, ?)",
+                           [(message_id + i + 1, chat_id, message_id + i + 1) for i in range(100 * scale)])
+        cursor.execute("INSERT OR IGNORE INTO user_api_keys (api_key, user_id) VALUES (?, ?)",
+                       (utils.CryptUtils.get_hash_512(api_key), user_ids[0]))
+        return {"user_ids": user_ids, "event_id": event_ids[0], "chat_id": chat_id}
+
+    return dbwriter.execute(job)
+
+
+def requests_for(ids: dict) -> dict[str, dict]:
+    user_ids = ids["user_ids"]
+    return {
+        "get_my_profile": {},
+        "users/get_profile": {"user_id": user_ids[1], "as_role": "Организатор"},
+        "users/get_profiles": {"user_ids": user_ids[:20], "as_role": "Организатор"},
+        "get_event_list": {},
+        "get_all_indicators": {},
+        "get_all_universities": {},
+        "get_event": {"event_id": ids["event_id"]},
+        "get_suggested_events": {},
+        "search_events": {"query": "хакат"},
+        "get_event_reviews": {"event_id": ids["event_id"]},
+        "events/get_requests": {"event_id": ids["event_id"]},
+        "chats/list": {},
+        "chats/history": {"chat_id": ids["chat_id"]},
+        "batch": {"requests": [{"id": method, "method": method} for method in
+                               ("get_my_profile", "get_all_indicators", "get_all_universities",
+                                "get_suggested_events", "get_event_list")]},
+        "set_my_profile_info": {"first_name": "Проверка", "university": 2},
+        "add_event_review": {"event_id": ids["event_id"], "stars": 5, "text": "budget"},
+        "events/join": {"event_id": ids["event_id"]},
+        "leaderboard": {"competence_id": 1, "university_id": 2, "limit": 50},
+        "leaderboard/my_position": {"competence_id": 1, "my_university": True},
+    }
+
+
+def measure(client, counter: StatementCounter, ids: dict) -> dict[str, int]:
+    counts = {}
+    for endpoint, body in requests_for(ids).items():
+        counter.reset()
+        response = client.post(f"/campus/api/v1/{endpoint}", json=dict(body, api_key=api_key))
+        if response.status_code != 200:
+            raise RuntimeError(f"{endpoint} answered {response.status_code}: {response.get_data(as_text=True)}")
+        counts[endpoint] = len(counter.statements)
+    return counts
+
+
+def run(scales: tuple[int, ...] = (1, 4), output: Callable[[str], None] = print) -> bool:
+    """
+    Seeds a copy of the main database, drives every endpoint in budgets through the Flask test client at growing
+    data sizes and checks the number of executed statements.
+
+    Returns:
+    - bool: False if an endpoint exceeded its budget or its statement count grew with the data size.
+    """
+    workdir = tempfile.mkdtemp(prefix="campus-query-budget-")
+    try:
+        shutil.copy(settings.get_main_db_path(), os.path.join(workdir, "main.db"))
+        picture_path = os.path.join(workdir, "picture.jpg")
+        with open(picture_path, "wb") as picture:
+            picture.write(b"\xff\xd8\xff\xd9")
+        settings_path = os.path.join(workdir, "settings.json")
+        with open(settings_path, "w") as file:
+            json.dump({"paths": {"main_db": os.path.join(workdir, "main.db"), "logs_dir": workdir,
+                                 "images_dir": workdir}}, file)
+        settings.load(settings_path)
+
+        import app
+        application = app.create_app({"MAINTENANCE": False, "COMPRESSION": False})
+        client = application.test_client()
+        counter = StatementCounter()
+
+        results = []
+        total = 0
+        for scale in scales:
+            total += scale
+            ids = seed(scale, picture_path)
+            dbmanager.set_statement_tracer(counter)
+            try:
+                results.append((total, measure(client, counter, ids)))
+            finally:
+                dbmanager.set_statement_tracer(None)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    passed = True
+    for endpoint, budget in budgets.items():
+        counts = [result[endpoint] for _, result in results]
+        problems = []
+        if max(counts) > budget:
+            problems.append(f"over budget {budget}")
+        if counts[-1] > counts[0]:
+            problems.append("grows with data size")
+        passed = passed and not problems
+        output(f"{'FAIL' if problems else 'ok':4} {endpoint:24} " +
+               " ".join(f"x{scale}: {count}" for (scale, _), count in zip(results, counts)) +
+               (f"  <- {', '.join(problems)}" if problems else ""))
+    return passed
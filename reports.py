@@ -0,0 +1,105 @@
+import itertools
+import sqlite3
+import tempfile
+from typing import IO, Iterator
+
+import dbmanager
+from data import CompetenciesManager
+
+chunk_size = 64 * 1024
+
+
+class ReportsManager:
+    """
+    Builds XLSX reports with openpyxl write-only workbooks.
+
+    Rows are streamed from SQLite cursors straight into the worksheet, so memory stays flat regardless of the
+    number of rows. Available reports are listed in ReportsManager.reports.
+    """
+    reports = ("events", "users", "test_results")
+    mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    @classmethod
+    def write_report(cls, name: str, file: IO[bytes], university_id: int = None):
+        """
+        Writes the report with the given name into a binary file.
+
+        Parameters:
+        - name (str): One of ReportsManager.reports.
+        - file (IO[bytes]): The file the workbook is saved to.
+        - university_id (int): If provided, only users of this university are included in the users report.
+
+        Raises:
+        - ValueError: If the report does not exist.
+        - sqlite3.DatabaseError: If there is an error with the database.
+        """
+        if name not in cls.reports:
+            raise ValueError(f"unknown report {name}")
+        # openpyxl is heavy to import and only needed when a report is built.
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(name)
+        with dbmanager.read_connection() as conn:
+            cursor = conn.cursor()
+            if name == "events":
+                rows = cls.__events_rows(cursor)
+            elif name == "users":
+                rows = cls.__users_rows(cursor, university_id)
+            else:
+                rows = cls.__test_results_rows(cursor)
+            for row in rows:
+                worksheet.append(row)
+        workbook.save(file)
+
+    @classmethod
+    def stream_report(cls, name: str, university_id: int = None) -> Iterator[bytes]:
+        """
+        Builds the report in a temporary file and yields it in chunks. The file is removed once it is sent.
+        """
+        file = tempfile.TemporaryFile()
+        try:
+            cls.write_report(name, file, university_id)
+            file.seek(0)
+            while chunk := file.read(chunk_size):
+                yield chunk
+        finally:
+            file.close()
+
+    @classmethod
+    def __events_rows(cls, cursor: sqlite3.Cursor) -> Iterator[list]:
+        yield ["event_id", "name", "date", "address", "verified", "organizer_id", "indicators"]
+        cursor.execute(
+            "SELECT e.id, e.name, e.date, e.address, e.verified, e.organizer_id, group_concat(i.name, '; ') "
+            "FROM events e LEFT JOIN events_indicators ei ON ei.event_id = e.id "
+            "LEFT JOIN indicators i ON i.id = ei.indicator_id GROUP BY e.id ORDER BY e.id")
+        for row in cursor:
+            yield list(row)
+
+    @classmethod
+    def __users_rows(cls, cursor: sqlite3.Cursor, university_id: int = None) -> Iterator[list]:
+        competencies = CompetenciesManager().competencies
+        competence_ids = sorted(competencies)
+        yield ["user_id", "first_name", "second_name", "third_name", "email", "university"] + \
+            [competencies[competence_id] for competence_id in competence_ids]
+        cursor.execute(
+            "SELECT u.id, u.firstname, u.secondname, u.thirdname, u.email, un.name, uc.competencies_id, uc.points "
+            "FROM users u LEFT JOIN univercities un ON un.id = u.univercities_id "
+            "LEFT JOIN user_competencies uc ON uc.user_id = u.id "
+            "WHERE ? IS NULL OR u.univercities_id = ? ORDER BY u.id",
+            (university_id, university_id))
+        for _, user_rows in itertools.groupby(cursor, key=lambda row: row[0]):
+            user_rows = list(user_rows)
+            points = {row[6]: row[7] for row in user_rows if row[6] is not None}
+            yield list(user_rows[0][:6]) + [points.get(competence_id) for competence_id in competence_ids]
+
+    @classmethod
+    def __test_results_rows(cls, cursor: sqlite3.Cursor) -> Iterator[list]:
+        yield ["result_id", "user_id", "email", "test_type", "competence", "competence_points", "timestamp"]
+        cursor.execute(
+            "SELECT r.id, r.user_id, u.email, t.name, c.name, r.competence_points, h.timestamp "
+            "FROM user_tests_results r LEFT JOIN users u ON u.id = r.user_id "
+            "LEFT JOIN test_type t ON t.id = r.test_type_id LEFT JOIN competencies c ON c.id = r.competence_id "
+            "LEFT JOIN user_tests_history h ON h.user_tests_results_id = r.id ORDER BY r.id")
+        for row in cursor:
+            yield list(row)
@@ -1,22 +1,39 @@
+import functools
 import json
-import os
-
-from icecream import ic
 
 settings_file = "./settings.json"
 
 
-def get_main_db_path() -> str:
+@functools.cache
+def _load_settings() -> dict:
     with open(settings_file, 'r') as file:
-        db = json.load(file)["paths"]["main_db"]
-        return db
+        return json.load(file)
+
+
+def load(path: str):
+    """
+    Switches to another settings file, e.g. for a separate database in checks and tools.
+    """
+    global settings_file
+    settings_file = path
+    _load_settings.cache_clear()
+
+
+def get_main_db_path() -> str:
+    return _load_settings()["paths"]["main_db"]
 
 
 def get_logs_dir() -> str:
-    with open(settings_file, 'r') as file:
-        return json.load(file)["paths"]["logs_dir"]
+    return _load_settings()["paths"]["logs_dir"]
 
 
 def get_images_dir() -> str:
-    with open(settings_file, 'r') as file:
-        return json.load(file)["paths"]["images_dir"]
+    return _load_settings()["paths"]["images_dir"]
+
+
+def get_maintenance_settings() -> dict:
+    return _load_settings().get("maintenance", {})
+
+
+def get_partitioning_settings() -> dict:
+    return _load_settings().get("partitioning", {"enabled": False})
@@ -7,8 +7,6 @@ from datetime import datetime
 import random
 import dbmanager
 
-from icecream import ic
-
 import settings
 
 logging_enabled = True
@@ -47,11 +45,14 @@ class OpStatus:
         global logging_enabled
         if logging_enabled:
             self.__create_log()
+        # icecream is slow to import and only needed once an operation status is reported.
+        from icecream import ic
         ic(self.formatted_message)
 
     def __create_log(self):
         now = datetime.now()
         current_log_file = now.strftime('%d.%m.%Y') + ".log"
+        os.makedirs(settings.get_logs_dir(), exist_ok=True)
         if os.path.exists(settings.get_logs_dir() + "/" + current_log_file):
             with open(settings.get_logs_dir() + "/" + current_log_file, 'a') as log:
                 log.write(self.formatted_message + '\n')